@@ -0,0 +1,590 @@
+"""
+PhotoSlicer performance benchmarks.
+
+Every benchmark runs offline on synthetic pages generated on the fly, so the
+numbers are reproducible on any machine:
+
+    python benchmark.py paste        # stitcher stages on an all-RGBA chapter
+    python benchmark.py encode       # encode time and bytes per encoder profile
+    python benchmark.py bubble-mask  # bubble-mask build time per megapixel
+    python benchmark.py pyramid      # watermark search, exhaustive vs pyramid mode
+    python benchmark.py detector     # panel detector throughput and ground-truth accuracy
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import engine
+
+
+def synthetic_page(width, height, seed, mode='RGB'):
+    """Deterministic manhwa-like page: colored panels with detail blobs on a white background."""
+    rng = np.random.default_rng(seed)
+    img = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    y = 40
+    while y < height - 200:
+        panel_h = min(int(rng.integers(300, 900)), height - y - 40)
+        color = tuple(int(c) for c in rng.integers(40, 220, 3))
+        draw.rectangle([30, y, width - 30, y + panel_h], fill=color, outline=(0, 0, 0), width=4)
+        for _ in range(30):
+            x0 = int(rng.integers(40, max(41, width - 80)))
+            y0 = int(rng.integers(y + 5, max(y + 6, y + panel_h - 40)))
+            draw.ellipse([x0, y0, x0 + 40, y0 + 30], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+        y += panel_h + int(rng.integers(30, 120))
+    if mode == 'RGBA':
+        # Soft transparent margins so the alpha channel actually matters
+        alpha = np.full((height, width), 255, dtype=np.uint8)
+        alpha[:, :20] = 0
+        alpha[:, -20:] = 0
+        img.putalpha(Image.fromarray(alpha, 'L'))
+    elif mode != 'RGB':
+        img = img.convert(mode)
+    return img
+
+
+def _best_time(fn, repeat):
+    """Best wall-clock time of `repeat` runs of `fn()` (seconds)."""
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _legacy_paste(dst, img, y):
+    """The stitcher's paste loop before the copy-free path (kept for comparison)."""
+    if img.mode in ('RGBA', 'LA'):
+        dst.paste(img.convert('RGB'), (0, y), mask=img.getchannel('A'))
+    else:
+        if img.mode != 'RGB':
+            converted = img.convert('RGB')
+            dst.paste(converted, (0, y))
+            converted.close()
+        else:
+            dst.paste(img, (0, y))
+
+
+def bench_paste(args):
+    """Decode/resize and paste stage timings for an all-RGBA chapter, legacy vs copy-free paste."""
+    tmp_dir = tempfile.mkdtemp(prefix="photoslicer_bench_")
+    try:
+        paths = []
+        for i in range(args.pages):
+            path = os.path.join(tmp_dir, f"{i + 1:03d}.png")
+            synthetic_page(args.source_width, args.source_height, i, mode='RGBA').save(path)
+            paths.append(path)
+
+        target_width, pages = engine._plan_stitch_layout(paths, args.width, True)
+        tasks = [(path, target_width, h) for path, h in pages]
+        total_height = sum(h for _, h in pages)
+
+        resized = []
+
+        def decode_stage():
+            resized[:] = [engine.process_and_resize(t) for t in tasks]
+
+        decode_time = _best_time(decode_stage, args.repeat)
+
+        def paste_stage(paste):
+            canvas = Image.new('RGB', (target_width, total_height), (255, 255, 255))
+            y = 0
+            for img in resized:
+                paste(canvas, img, y)
+                y += img.height
+            canvas.close()
+
+        legacy_time = _best_time(lambda: paste_stage(_legacy_paste), args.repeat)
+        new_time = _best_time(lambda: paste_stage(engine._paste_page), args.repeat)
+
+        # Full-page intermediates the legacy loop allocates per RGBA page:
+        # an RGB copy (4 bytes/px in Pillow) plus an L copy of the alpha channel.
+        legacy_bytes = sum(img.width * img.height * 5 for img in resized)
+
+        print(f"Chapter: {len(resized)} RGBA pages -> {target_width}x{total_height} canvas")
+        print(f"{'stage':<26}{'time (s)':>12}{'intermediates (MB)':>22}")
+        print(f"{'decode + resize':<26}{decode_time:>12.3f}{'-':>22}")
+        print(f"{'paste (legacy)':<26}{legacy_time:>12.3f}{legacy_bytes / 1e6:>22.1f}")
+        print(f"{'paste (copy-free)':<26}{new_time:>12.3f}{0.0:>22.1f}")
+        if new_time > 0:
+            print(f"Paste speedup: {legacy_time / new_time:.2f}x")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _encoded_size(img, fmt, quality, profile, tmp_dir):
+    """Encode `img` once with `profile`; returns the output size in bytes."""
+    if fmt == 'psd':
+        path = os.path.join(tmp_dir, "slice.psd")
+        engine.save_psd_layered(img, path, zlib_level=engine._encoder_params('psd', profile)['zlib_level'])
+        return os.path.getsize(path)
+    buffer = io.BytesIO()
+    engine.save_encoded(img, buffer, fmt, quality, profile)
+    return buffer.tell()
+
+
+def bench_encode(args):
+    """Encode time and output bytes of a sample chapter's slices for every profile and format."""
+    tmp_dir = tempfile.mkdtemp(prefix="photoslicer_bench_")
+    try:
+        # Grayscale slices stand in for manga pages; the stitched slices are RGB either way
+        slices = [
+            synthetic_page(args.width, args.slice_height, i, mode='L' if i < args.gray_slices else 'RGB').convert('RGB')
+            for i in range(args.slices)
+        ]
+        formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+
+        print(f"Chapter: {len(slices)} slices of {args.width}x{args.slice_height} "
+              f"({min(args.gray_slices, len(slices))} grayscale), quality {args.quality}")
+        print(f"{'format':<8}{'profile':<11}{'time (s)':>10}{'MB':>10}{'vs balanced':>14}")
+        for fmt in formats:
+            reference = None
+            rows = []
+            for profile in engine.ENCODER_PROFILES:
+                sizes = []
+
+                def encode_all():
+                    sizes[:] = [_encoded_size(img, fmt, args.quality, profile, tmp_dir) for img in slices]
+
+                elapsed = _best_time(encode_all, args.repeat)
+                total = sum(sizes)
+                if profile == engine.DEFAULT_ENCODER_PROFILE:
+                    reference = (elapsed, total)
+                rows.append((profile, elapsed, total))
+            for profile, elapsed, total in rows:
+                relative = f"{elapsed / reference[0]:.2f}x / {total / reference[1]:.2f}x" if reference else "-"
+                print(f"{fmt:<8}{profile:<11}{elapsed:>10.3f}{total / 1e6:>10.2f}{relative:>14}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bubble_page(width, height, seed, bubbles):
+    """`synthetic_page` with white speech bubbles (outline, tail and text lines) drawn over it."""
+    img = synthetic_page(width, height, seed)
+    draw = ImageDraw.Draw(img)
+    rng = np.random.default_rng(seed)
+    for _ in range(bubbles):
+        bw, bh = int(rng.integers(120, 260)), int(rng.integers(80, 200))
+        x = int(rng.integers(0, max(1, width - bw)))
+        y = int(rng.integers(0, max(1, height - bh - 60)))
+        draw.ellipse([x, y, x + bw, y + bh], fill=(255, 255, 255), outline=(0, 0, 0), width=3)
+        tail_x = x + bw // 2
+        draw.polygon([(tail_x, y + bh - 5), (tail_x + 20, y + bh - 5), (tail_x - 10, y + bh + 60)], fill=(255, 255, 255))
+        for line in range(3):
+            draw.text((x + bw // 4, y + bh // 4 + 14 * line), "HELLO THERE", fill=(0, 0, 0))
+    return img
+
+
+def _legacy_bubble_mask(gray, saturation, scale=None):
+    """`build_bubble_mask` before the two-step block statistics and bit-packed growth (kept for comparison)."""
+    if scale is None:
+        scale = engine.ContentAwarePanelDetector.BUBBLE_MASK_SCALE
+    H, W = gray.shape
+    hh, ww = (H // scale) * scale, (W // scale) * scale
+    h, w = hh // scale, ww // scale
+    if h < 8 or w < 8:
+        return np.zeros((max(h, 1), max(w, 1)), dtype=bool)
+
+    blocks = gray[:hh, :ww].reshape(h, scale, w, scale)
+    g_mean = blocks.mean(axis=(1, 3))
+    g_min = blocks.min(axis=(1, 3))
+    if saturation is not None:
+        s_mean = saturation[:hh, :ww].reshape(h, scale, w, scale).mean(axis=(1, 3))
+    else:
+        s_mean = np.zeros((h, w), dtype=np.float32)
+
+    white = (g_mean > 225) & (g_min > 165) & (s_mean < 0.10 * 255)
+    dark = g_min < 100
+
+    tile = max(6, 48 // scale)
+    th, tw = h // tile, w // tile
+    if th < 1 or tw < 1:
+        return np.zeros((h, w), dtype=bool)
+
+    dk = dark[:th * tile, :tw * tile].reshape(th, tile, tw, tile)
+    wh = white[:th * tile, :tw * tile].reshape(th, tile, tw, tile)
+    dark_cells = dk.mean(axis=(1, 3))
+    white_cells = wh.mean(axis=(1, 3))
+    trans = (dk[:, :, :, 1:] != dk[:, :, :, :-1]).mean(axis=(1, 3))
+    text_tile = (white_cells > 0.35) & (dark_cells > 0.08) & (dark_cells < 0.45) & (trans > 0.15)
+    text_tile &= ~dk.all(axis=1).any(axis=-1) & ~dk.all(axis=3).any(axis=1)
+
+    seeds = np.zeros((h, w), dtype=bool)
+    seeds[:th * tile, :tw * tile] = np.repeat(np.repeat(text_tile, tile, axis=0), tile, axis=1)
+    seeds &= white
+    if not seeds.any():
+        return np.zeros((h, w), dtype=bool)
+
+    # Frontier BFS, one 4-connected step per iteration
+    mask = np.ascontiguousarray(seeds)
+    white_flat = np.ascontiguousarray(white).ravel()
+    mask_flat = mask.ravel()
+    frontier = np.flatnonzero(mask_flat)
+    for _ in range(max(10, min(16, 64 // scale))):
+        if frontier.size == 0:
+            break
+        up = frontier[frontier >= w] - w
+        down = frontier[frontier < (h - 1) * w] + w
+        left = frontier[frontier % w != 0] - 1
+        right = frontier[frontier % w != w - 1] + 1
+        cand = np.concatenate((up, down, left, right))
+        cand = cand[white_flat[cand] & ~mask_flat[cand]]
+        if cand.size == 0:
+            break
+        cand = np.unique(cand)
+        mask_flat[cand] = True
+        frontier = cand
+
+    if mask.mean() > 0.5:
+        return np.zeros((h, w), dtype=bool)
+    return mask
+
+
+def bench_bubble_mask(args):
+    """build_bubble_mask time per megapixel on bubble-heavy pages, legacy vs current."""
+    detector = engine.ContentAwarePanelDetector
+    heights = [int(v) for v in args.heights.split(',') if v.strip()]
+
+    print(f"{'page':<14}{'bubbles':>9}{'legacy (s/MP)':>16}{'current (s/MP)':>16}{'speedup':>10}{'same':>6}")
+    for i, height in enumerate(heights):
+        bubbles = max(1, height * args.bubbles_per_kpx // 1000)
+        rgb = np.array(bubble_page(args.width, height, i, bubbles))
+        gray = detector.to_grayscale(rgb)
+        saturation = detector.get_saturation(rgb)
+        megapixels = args.width * height / 1e6
+
+        legacy_mask = _legacy_bubble_mask(gray, saturation)
+        current_mask = detector.build_bubble_mask(gray, saturation)
+        same = "yes" if np.array_equal(legacy_mask, current_mask) else "NO"
+
+        legacy_time = _best_time(lambda: _legacy_bubble_mask(gray, saturation), args.repeat)
+        current_time = _best_time(lambda: detector.build_bubble_mask(gray, saturation), args.repeat)
+        speedup = f"{legacy_time / current_time:.2f}x" if current_time > 0 else "-"
+        print(f"{f'{args.width}x{height}':<14}{bubbles:>9}{legacy_time / megapixels:>16.4f}"
+              f"{current_time / megapixels:>16.4f}{speedup:>10}{same:>6}")
+
+
+def bench_pyramid(args):
+    """Watermark placement search time and placement agreement, exhaustive vs pyramid mode."""
+    detector = engine.ContentAwarePanelDetector
+    wm_size = (args.wm_width, args.wm_height)
+    bubbles = max(1, args.height * args.bubbles_per_kpx // 1000)
+
+    print(f"{'page':<6}{'exhaustive (s)':>16}{'pyramid (s)':>13}{'speedup':>10}{'same y':>8}{'overlap':>9}{'max dy':>8}")
+    totals = [0.0, 0.0, 0, 0, 0]
+    for i in range(args.pages):
+        img = bubble_page(args.width, args.height, i, bubbles)
+        gray, saturation = engine.gray_and_saturation(img)
+        bubble_mask = detector.build_bubble_mask(gray, saturation)
+        gutters = detector.find_gutters(gray, saturation)
+
+        def search(mode):
+            return engine._search_segment_placements(
+                None, args.width, args.height, wm_size, args.count, args.edge, args.margin,
+                gray, saturation, bubble_mask, gutters, search_mode=mode
+            )
+
+        exhaustive, pyramid = search('exhaustive'), search('pyramid')
+        exhaustive_time = _best_time(lambda: search('exhaustive'), args.repeat)
+        pyramid_time = _best_time(lambda: search('pyramid'), args.repeat)
+
+        # Placements agree when their footprints overlap by at least half the watermark height
+        dys = [abs(a[1] - b[1]) for a, b in zip(exhaustive, pyramid)]
+        same = sum(dy == 0 for dy in dys)
+        overlap = sum(dy <= args.wm_height // 2 for dy in dys)
+        speedup = f"{exhaustive_time / pyramid_time:.2f}x" if pyramid_time > 0 else "-"
+        print(f"{i:<6}{exhaustive_time:>16.4f}{pyramid_time:>13.4f}{speedup:>10}"
+              f"{f'{same}/{len(dys)}':>8}{f'{overlap}/{len(dys)}':>9}{max(dys, default=0):>8}")
+        totals[0] += exhaustive_time
+        totals[1] += pyramid_time
+        totals[2] += same
+        totals[3] += overlap
+        totals[4] += len(dys)
+
+    if totals[4]:
+        print(f"total: {totals[0]:.3f}s exhaustive, {totals[1]:.3f}s pyramid "
+              f"({totals[0] / max(totals[1], 1e-9):.2f}x); same y {totals[2] / totals[4]:.0%}, "
+              f"overlapping {totals[3] / totals[4]:.0%} of {totals[4]} placements")
+
+
+# Gutter fills per ground-truth type; 'uniform' is a flat mid-tone that is neither white nor black
+GUTTER_FILLS = {'white': (255, 255, 255), 'black': (0, 0, 0), 'uniform': (72, 84, 112)}
+
+
+def detector_page(width, height, seed, bubbles):
+    """
+    Deterministic page with known ground truth for the panel detector:
+    saturated, textured art panels separated by white, black and uniform
+    gutters, and white speech bubbles with tails and text lines, some of
+    them against the page edges where watermarks go.
+
+    Returns `(img, truth)`; `truth` has 'gutters' (dicts with 'start',
+    'end', 'type'), 'bubbles' (ellipse boxes `(x0, y0, x1, y1)`) and
+    'bubble_boxes' (the same boxes grown to include each tail).
+    """
+    rng = np.random.default_rng(seed)
+    types = list(GUTTER_FILLS)
+    arr = np.empty((height, width, 3), dtype=np.uint8)
+    gutters = []
+
+    y = 0
+    while y < height:
+        g_type = types[int(rng.integers(len(types)))]
+        g_end = min(height, y + int(rng.integers(24, 90)))
+        arr[y:g_end] = GUTTER_FILLS[g_type]
+        gutters.append({'start': y, 'end': g_end, 'type': g_type})
+        y = g_end
+        if y >= height:
+            break
+        panel_end = min(height, y + int(rng.integers(350, 1100)))
+        # Saturated vertical gradient between two strong colors, plus grain
+        top, bottom = (rng.permutation([int(rng.integers(200, 256)), int(rng.integers(60, 140)), int(rng.integers(0, 40))])
+                       for _ in range(2))
+        t = np.linspace(0.0, 1.0, panel_end - y)[:, None]
+        ramp = (1 - t) * np.asarray(top, dtype=np.float64) + t * np.asarray(bottom, dtype=np.float64)
+        grain = rng.normal(0.0, 10.0, (panel_end - y, width, 1))
+        arr[y:panel_end] = np.clip(ramp[:, None, :] + grain, 0, 255).astype(np.uint8)
+        y = panel_end
+    # Zero-height sentinel closing a last panel that runs to the bottom (dropped below)
+    if gutters[-1]['end'] != height:
+        gutters.append({'start': height, 'end': height, 'type': gutters[-1]['type']})
+
+    img = Image.fromarray(arr, 'RGB')
+    draw = ImageDraw.Draw(img)
+    for g_prev, g_next in zip(gutters, gutters[1:]):
+        # Shapes and line art inside each panel
+        p0, p1 = g_prev['end'], g_next['start']
+        for _ in range(max(1, (p1 - p0) // 40)):
+            x0 = int(rng.integers(0, max(1, width - 60)))
+            y0 = int(rng.integers(p0, max(p0 + 1, p1 - 50)))
+            fill = tuple(int(c) for c in rng.permutation([int(rng.integers(180, 256)), int(rng.integers(0, 120)), int(rng.integers(0, 60))]))
+            draw.ellipse([x0, y0, x0 + int(rng.integers(20, 90)), min(p1 - 1, y0 + int(rng.integers(20, 70)))], fill=fill)
+            draw.line([x0, y0, x0 + int(rng.integers(-60, 60)), min(p1 - 1, y0 + 40)], fill=(15, 15, 15), width=2)
+    gutters = [g for g in gutters if g['end'] > g['start']]
+
+    ellipses, boxes = [], []
+    for _ in range(bubbles):
+        bw, bh = int(rng.integers(140, 280)), int(rng.integers(90, 190))
+        side = rng.random()
+        if side < 0.3:
+            x = 0
+        elif side < 0.6:
+            x = width - bw
+        else:
+            x = int(rng.integers(0, max(1, width - bw)))
+        y = int(rng.integers(70, max(71, height - bh - 70)))
+        draw.ellipse([x, y, x + bw, y + bh], fill=(255, 255, 255), outline=(0, 0, 0), width=3)
+        tail_x = x + bw // 2 + int(rng.integers(-bw // 4, bw // 4 + 1))
+        if rng.random() < 0.5:
+            tip = (tail_x - 15, y + bh + 60)
+            draw.polygon([(tail_x - 12, y + bh - 6), (tail_x + 12, y + bh - 6), tip], fill=(255, 255, 255), outline=(0, 0, 0))
+            box = (x, y, x + bw, y + bh + 60)
+        else:
+            tip = (tail_x + 15, y - 60)
+            draw.polygon([(tail_x - 12, y + 6), (tail_x + 12, y + 6), tip], fill=(255, 255, 255), outline=(0, 0, 0))
+            box = (x, y - 60, x + bw, y + bh)
+        # Fill the bubble's inner box with text, as lettered bubbles are
+        for line in range(max(1, (bh // 2) // 13)):
+            draw.text((x + bw // 5, y + bh // 4 + 13 * line), "WAIT, WHAT?! " * (bw // 100), fill=(0, 0, 0))
+        ellipses.append((x, y, x + bw, y + bh))
+        boxes.append(box)
+
+    return img, {'gutters': gutters, 'bubbles': ellipses, 'bubble_boxes': boxes}
+
+
+def _box_overlap(box, others):
+    """True when `box` intersects any of `others` (all `(x0, y0, x1, y1)`, end-exclusive)."""
+    x0, y0, x1, y1 = box
+    return any(x0 < ox1 and ox0 < x1 and y0 < oy1 and oy0 < y1 for ox0, oy0, ox1, oy1 in others)
+
+
+def bench_detector(args):
+    """Throughput and ground-truth accuracy of the panel detector stages on synthetic pages."""
+    detector = engine.ContentAwarePanelDetector
+    wm_w, wm_h = args.wm_width, args.wm_height
+    bubbles = max(1, args.height * args.bubbles_per_kpx // 1000)
+    rng = np.random.default_rng(args.seed)
+    if args.edge == 'left':
+        x0, x1 = args.margin, args.margin + wm_w
+    else:
+        x0, x1 = args.width - args.margin - wm_w, args.width - args.margin
+
+    times = dict.fromkeys(('mask', 'gutters', 'region', 'position'), 0.0)
+    mask_hit = mask_total = stray = outside = 0
+    gutter_found = {t: [0, 0] for t in GUTTER_FILLS}
+    flagged = [0, 0, 0, 0]  # bubble footprints flagged / total, clean footprints flagged / total
+    placements = on_bubble = 0
+    megapixels = 0.0
+
+    for page in range(args.pages):
+        img, truth = detector_page(args.width, args.height, args.seed + page, bubbles)
+        gray, saturation = engine.gray_and_saturation(img)
+        megapixels += args.width * args.height / 1e6
+
+        mask = None
+
+        def build_mask():
+            nonlocal mask
+            mask = detector.build_bubble_mask(gray, saturation)
+
+        times['mask'] += _best_time(build_mask, args.repeat)
+        scale = detector.BUBBLE_MASK_SCALE
+        # The mask marks the white around the lettering, so a bubble counts as
+        # covered once a tenth of its ellipse box is masked
+        inside = np.zeros(mask.shape, dtype=bool)
+        for bx0, by0, bx1, by1 in truth['bubbles']:
+            cells = mask[by0 // scale:-(-by1 // scale), bx0 // scale:-(-bx1 // scale)]
+            mask_hit += cells.size > 0 and np.mean(cells) >= 0.1
+            mask_total += 1
+        for bx0, by0, bx1, by1 in truth['bubble_boxes']:
+            inside[max(0, by0) // scale:-(-by1 // scale), bx0 // scale:-(-bx1 // scale)] = True
+        stray += np.count_nonzero(mask & ~inside)
+        outside += np.count_nonzero(~inside)
+
+        gutters = []
+
+        def find():
+            gutters[:] = detector.find_gutters(gray, saturation)
+
+        times['gutters'] += _best_time(find, args.repeat)
+        # A ground-truth gutter is found when detected gutters of its type cover
+        # half its rows; gutters a bubble crosses are no longer full-width rows and are skipped
+        for g in truth['gutters']:
+            if any(by0 < g['end'] and g['start'] < by1 for _, by0, _, by1 in truth['bubble_boxes']):
+                continue
+            covered = sum(max(0, min(g['end'], d['end']) - max(g['start'], d['start']))
+                          for d in gutters if d['type'] == g['type'])
+            gutter_found[g['type']][0] += covered * 2 >= g['end'] - g['start']
+            gutter_found[g['type']][1] += 1
+
+        panel_edges = [0, args.height] + [v for g in gutters for v in (g['start'], g['end'])]
+        col_white = np.mean(gray[:, x0:x1] > detector.BUBBLE_WHITE_THRESHOLD, axis=0)
+        sample_ys = rng.integers(0, args.height - wm_h, args.samples)
+        results = []
+
+        def analyze():
+            results[:] = [detector.analyze_region_detailed(
+                gray, saturation, int(y), wm_h, wm_w, args.height, args.edge, args.margin,
+                bubble_mask=mask, mask_scale=scale, panel_edges=panel_edges, col_white=col_white
+            ) for y in sample_ys]
+
+        times['region'] += _best_time(analyze, args.repeat)
+        for y, (score, info) in zip(sample_ys, results):
+            unsafe = (score < detector.MIN_SAFE_SCORE or info.get('is_speech_bubble', False)
+                      or info.get('bubble_overlap', False))
+            k = 0 if _box_overlap((x0, int(y), x1, int(y) + wm_h), truth['bubbles']) else 2
+            flagged[k] += unsafe
+            flagged[k + 1] += 1
+
+        found = []
+
+        def place():
+            found.clear()
+            segment = args.height / args.count
+            for i in range(args.count):
+                s0, s1 = int(i * segment), int((i + 1) * segment)
+                found.append(detector.find_best_watermark_position(
+                    None, args.width, args.height, wm_w, wm_h, s0, s1, args.edge, args.margin,
+                    gray=gray, saturation=saturation, bubble_mask=mask, mask_scale=scale,
+                    gutters=gutters, col_white=col_white, search_mode=args.search_mode
+                ))
+
+        times['position'] += _best_time(place, args.repeat)
+        for x, y, _, _ in found:
+            placements += 1
+            on_bubble += _box_overlap((x, y, x + wm_w, y + wm_h), truth['bubble_boxes'])
+
+    def pct(a, b):
+        return f"{a}/{b} ({a / b:.0%})" if b else "-"
+
+    calls = args.pages * args.samples
+    rows = [
+        ('build_bubble_mask', times['mask'], f"{megapixels / times['mask']:.1f} MP/s",
+         f"bubbles covered {pct(mask_hit, mask_total)}, stray mask on {stray / max(outside, 1):.2%} of other cells"),
+        ('find_gutters', times['gutters'], f"{megapixels / times['gutters']:.1f} MP/s",
+         "clear gutters " + ", ".join(f"{t} {pct(*gutter_found[t])}" for t in GUTTER_FILLS)),
+        ('analyze_region_detailed', times['region'], f"{calls / times['region']:.0f} calls/s",
+         f"unsafe on bubbles {pct(flagged[0], flagged[1])}, on clean art {pct(flagged[2], flagged[3])}"),
+        ('find_best_watermark_position', times['position'], f"{args.pages * args.count / times['position']:.1f} seg/s",
+         f"on a bubble {pct(on_bubble, placements)} ({args.search_mode})"),
+    ]
+    print(f"Detector on {args.pages} pages of {args.width}x{args.height} ({megapixels:.1f} MP), "
+          f"{bubbles} bubbles per page, seed {args.seed}")
+    print(f"{'stage':<30}{'time (s)':>10}{'throughput':>16}  accuracy")
+    for name, elapsed, throughput, accuracy in rows:
+        print(f"{name:<30}{elapsed:>10.3f}{throughput:>16}  {accuracy}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PhotoSlicer performance benchmarks (synthetic, offline).")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("paste", help="stitcher decode/resize and paste stages on an all-RGBA chapter")
+    p.add_argument("--pages", type=int, default=40)
+    p.add_argument("--source-width", type=int, default=1200)
+    p.add_argument("--source-height", type=int, default=1800)
+    p.add_argument("--width", type=int, default=800)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_paste)
+
+    p = sub.add_parser("encode", help="encode time and bytes per encoder profile on a sample chapter")
+    p.add_argument("--slices", type=int, default=6)
+    p.add_argument("--width", type=int, default=800)
+    p.add_argument("--slice-height", type=int, default=4000)
+    p.add_argument("--gray-slices", type=int, default=3, help="how many of the slices are grayscale")
+    p.add_argument("--quality", type=int, default=90)
+    p.add_argument("--formats", default="webp,jpg,png,psd")
+    p.add_argument("--repeat", type=int, default=1)
+    p.set_defaults(func=bench_encode)
+
+    p = sub.add_parser("bubble-mask", help="build_bubble_mask time per megapixel, legacy vs current")
+    p.add_argument("--width", type=int, default=800)
+    p.add_argument("--heights", default="4000,12000,30000")
+    p.add_argument("--bubbles-per-kpx", type=int, default=4, help="speech bubbles per 1000 px of page height")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_bubble_mask)
+
+    p = sub.add_parser("pyramid", help="watermark placement search, exhaustive vs pyramid mode")
+    p.add_argument("--pages", type=int, default=6)
+    p.add_argument("--width", type=int, default=800)
+    p.add_argument("--height", type=int, default=12000)
+    p.add_argument("--bubbles-per-kpx", type=int, default=4, help="speech bubbles per 1000 px of page height")
+    p.add_argument("--count", type=int, default=4, help="watermarks (segments) per page")
+    p.add_argument("--wm-width", type=int, default=120)
+    p.add_argument("--wm-height", type=int, default=48)
+    p.add_argument("--edge", choices=("left", "right"), default="right")
+    p.add_argument("--margin", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_pyramid)
+
+    p = sub.add_parser("detector", help="panel detector throughput and accuracy against synthetic ground truth")
+    p.add_argument("--pages", type=int, default=4)
+    p.add_argument("--width", type=int, default=800)
+    p.add_argument("--height", type=int, default=12000)
+    p.add_argument("--bubbles-per-kpx", type=int, default=4, help="speech bubbles per 1000 px of page height")
+    p.add_argument("--samples", type=int, default=300, help="analyze_region_detailed calls per page")
+    p.add_argument("--count", type=int, default=4, help="watermarks (segments) per page")
+    p.add_argument("--wm-width", type=int, default=120)
+    p.add_argument("--wm-height", type=int, default=48)
+    p.add_argument("--edge", choices=("left", "right"), default="right")
+    p.add_argument("--margin", type=int, default=0)
+    p.add_argument("--search-mode", choices=("exhaustive", "pyramid"), default="exhaustive")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=1)
+    p.set_defaults(func=bench_detector)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
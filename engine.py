@@ -1,13 +1,22 @@
 from math import ceil
 from PIL import Image, ImageFile
+import io
 import os
+import zlib
+import hashlib
 import zipfile
 import shutil
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from collections import OrderedDict, deque
+from itertools import islice
+from bisect import bisect_right
 from pathlib import Path
 import tempfile
-import img2pdf
+import threading
+import queue
+import json
 import numpy as np
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 Image.MAX_IMAGE_PIXELS = None
@@ -28,6 +37,75 @@ except ImportError:
 
 IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "avif", "psd"}
 
+# Persistent caches (image metadata index, ...) live next to the app settings.
+CACHE_DIR = os.path.join(os.path.expanduser("~"), "Documents", "EMKH_Apps", "PhotoSlicer", "cache")
+METADATA_INDEX_PATH = os.path.join(CACHE_DIR, "image_metadata.json")
+WATERMARK_PLACEMENT_CACHE_PATH = os.path.join(CACHE_DIR, "watermark_placements.json")
+
+# Rows converted per step when a non-RGB page is composited onto a canvas;
+# bounds the temporary buffers to one band instead of a full-page copy.
+PASTE_BAND_ROWS = 256
+
+# Rows per chunk of the fused grayscale + saturation pass that feeds the
+# watermark analysis (see `gray_and_saturation`); its scratch buffers are
+# one chunk instead of full-image L, RGB and HSV copies.
+ANALYSIS_CHUNK_ROWS = 256
+
+# Fraction of the currently available physical memory a stitched canvas may
+# use before the stitcher switches to a disk-backed (memory-mapped) canvas.
+MEMMAP_CANVAS_RATIO = 0.6
+
+# Shrink-on-load never decodes a page below this multiple of its resize
+# target, so the final BICUBIC pass still downsamples from real detail and
+# the output is visually unchanged.
+SHRINK_ON_LOAD_GUARD = 2
+
+# Encoder effort profiles: named presets of per-format encoder parameters,
+# trading encode time against file size at the same `quality`. 'balanced'
+# is the default and reproduces the historical settings exactly (WebP
+# method 6, optimized progressive JPEG, optimized PNG, PSD zlib level 6),
+# which are already the encoders' top effort for WebP/JPEG/PNG. 'smallest'
+# therefore shrinks JPEG/PNG by storing each slice in the smallest mode that
+# keeps every pixel (`reduce_mode`, see `_reduce_mode_losslessly`) and uses
+# the slower PSD deflate level; WebP has no smaller setting and is encoded
+# as in 'balanced'. 'fastest' drops to the cheapest setting of each
+# encoder. Compare them with `python benchmark.py encode`.
+ENCODER_PROFILES = {
+    'fastest': {
+        'webp': {'method': 0},
+        'jpeg': {'optimize': False, 'progressive': False},
+        'png': {'compress_level': 1},
+        'psd': {'zlib_level': 1},
+    },
+    'balanced': {
+        'webp': {'method': 6},
+        'jpeg': {'optimize': True, 'progressive': True},
+        'png': {'optimize': True},
+        'psd': {'zlib_level': 6},
+    },
+    'smallest': {
+        'webp': {'method': 6},
+        'jpeg': {'optimize': True, 'progressive': True, 'reduce_mode': True},
+        'png': {'optimize': True, 'reduce_mode': True},
+        'psd': {'zlib_level': 9},
+    },
+}
+DEFAULT_ENCODER_PROFILE = 'balanced'
+
+# Output formats that are already compressed: archives store these entries
+# as-is, since deflating them again burns CPU for next to no size gain.
+ARCHIVE_STORED_FORMATS = ('jpg', 'jpeg', 'webp', 'png')
+
+# Target-bytes mode: per-slice quality search bounds and fan-out. Each
+# round encodes QUALITY_SEARCH_WAYS candidate qualities in parallel (in
+# memory) and keeps only the gap where the size crosses the budget, so the
+# full range resolves in about three rounds instead of seven sequential
+# bisection steps. Only these lossy formats have a quality knob to search.
+QUALITY_SEARCH_MIN = 10
+QUALITY_SEARCH_MAX = 100
+QUALITY_SEARCH_WAYS = 4
+BYTE_BUDGET_FORMATS = ('jpg', 'jpeg', 'webp')
+
 # WebP cannot encode an image taller or wider than this. Any slice that exceeds
 # it fails to save (silently aborting the worker thread), so for WebP output the
 # cut points are capped to guarantee every slice stays within the limit.
@@ -323,27 +401,223 @@ def open_image_robust(path):
             return None
 
 
-def get_image_size_fast(path):
+def open_image_for_size(path, target_width, target_height):
     """
-    Gets image dimensions without loading pixel data into memory (Lazy Read).
-    Significant speedup for the first pass.
+    Open an image that is about to be resized to `target_width x target_height`,
+    skipping decode work that the resize would throw away (shrink-on-load).
+
+    JPEGs are decoded with `draft()` DCT scaling; other raster formats get an
+    integer `reduce()` pre-pass. Both stop at `SHRINK_ON_LOAD_GUARD` times
+    the target size. PSDs fall back to `open_image_robust`.
     """
-    file_ext = os.path.splitext(path)[1].lower()
-    if file_ext == '.psd':
-        # PSD tools reads header efficiently usually
+    if os.path.splitext(path)[1].lower() == '.psd':
+        return open_image_robust(path)
+
+    guard_w = target_width * SHRINK_ON_LOAD_GUARD
+    guard_h = target_height * SHRINK_ON_LOAD_GUARD
+    try:
+        img = Image.open(path)
+        if img.format == 'JPEG':
+            img.draft(None, (guard_w, guard_h))
+        img.load()
+    except Exception as e:
+        print(f"Warning: Could not open image file {path}. Skipping. Error: {e}")
+        return None
+
+    factor = min(img.width // max(1, guard_w), img.height // max(1, guard_h))
+    if factor >= 2:
         try:
-            from psd_tools import PSDImage
-            psd = PSDImage.open(path)
-            return psd.width, psd.height
+            reduced = img.reduce(factor)
+            img.close()
+            img = reduced
         except Exception:
-            return (0, 0)
-            
+            pass
+    return img
+
+
+# PSD header color modes -> (PIL-style mode name, channels without alpha)
+_PSD_COLOR_MODES = {0: ('1', 1), 1: ('L', 1), 2: ('P', 1), 3: ('RGB', 3), 4: ('CMYK', 4), 7: ('RGB', 3), 8: ('L', 1), 9: ('LAB', 3)}
+
+
+def _read_psd_header(path):
+    """Parse the fixed 26-byte PSD/PSB file header. Returns (width, height, mode, has_alpha) or None."""
+    import struct
     try:
-        # For standard images, Image.open reads only headers initially
-        with Image.open(path) as img:
-            return img.width, img.height
-    except Exception:
+        with open(path, 'rb') as f:
+            header = f.read(26)
+    except OSError:
+        return None
+    if len(header) < 26 or header[:4] != b'8BPS':
+        return None
+    _, channels, height, width, _, color_mode = struct.unpack('>H6xHIIHH', header[4:])
+    mode, base_channels = _PSD_COLOR_MODES.get(color_mode, ('RGB', 3))
+    return width, height, mode, channels > base_channels
+
+
+def _read_image_metadata(path):
+    """
+    Header-only scan of one image: returns a dict with `width`, `height`,
+    `mode`, `has_alpha` and `is_gray`, or None if the file cannot be read.
+    """
+    if os.path.splitext(path)[1].lower() == '.psd':
+        header = _read_psd_header(path)
+        if header is None:
+            # Unusual header: let psd-tools parse the whole file
+            try:
+                from psd_tools import PSDImage
+                psd = PSDImage.open(path)
+                header = (psd.width, psd.height, 'RGB', False)
+            except Exception:
+                return None
+        width, height, mode, has_alpha = header
+    else:
+        try:
+            # For standard images, Image.open reads only headers initially
+            with Image.open(path) as img:
+                width, height, mode = img.width, img.height, img.mode
+                has_alpha = mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in img.info
+        except Exception:
+            return None
+    if width <= 0 or height <= 0:
+        return None
+    return {
+        'width': int(width),
+        'height': int(height),
+        'mode': mode,
+        'has_alpha': bool(has_alpha),
+        'is_gray': mode in ('1', 'L', 'LA', 'I', 'I;16', 'F'),
+    }
+
+
+def _write_json_atomic(path, payload):
+    """
+    Write `payload` as JSON to `path` via a uniquely named temp file in the
+    same directory and `os.replace`, so concurrent writers never share a
+    temp file and readers never see a partial file.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ImageMetadataIndex:
+    """
+    Persistent on-disk index of image header metadata.
+
+    Entries are keyed by (path, mtime_ns, size), so an edited or replaced
+    file is simply re-scanned. Every stage of a job (WebP limit check,
+    stitch layout, ...) reads from the same index, and re-running the same
+    chapters with another preset skips the header pass almost entirely.
+    Beyond MAX_ENTRIES the least recently used entries are evicted; hits
+    reorder entries in memory only, so a fully warm run does not rewrite
+    the file.
+    """
+
+    VERSION = 1
+    MAX_ENTRIES = 50000
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _load(self):
+        """Read the index file, ignoring it if it is missing, corrupt or from another version."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION and isinstance(data.get('entries'), dict):
+                self._entries = data['entries']
+        except (OSError, ValueError, AttributeError):
+            self._entries = {}
+
+    @staticmethod
+    def _stat_key(path):
+        """Return (normalized path, mtime_ns, size), or None if the file cannot be stat'ed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return os.path.normcase(os.path.abspath(path)), st.st_mtime_ns, st.st_size
+
+    def get(self, path):
+        """Metadata dict for `path`, scanning the header (and caching the result) on a miss."""
+        key = self._stat_key(path)
+        if key is None:
+            return None
+        norm, mtime_ns, size = key
+        with self._lock:
+            entry = self._entries.get(norm)
+            if entry and entry.get('mtime_ns') == mtime_ns and entry.get('size') == size:
+                self._entries[norm] = self._entries.pop(norm)  # most recently used goes last
+                return entry
+
+        meta = _read_image_metadata(path)
+        if meta is None:
+            return None
+        entry = dict(meta, mtime_ns=mtime_ns, size=size)
+        with self._lock:
+            self._entries.pop(norm, None)
+            self._entries[norm] = entry
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.pop(next(iter(self._entries)))
+            self._dirty = True
+        return entry
+
+    def prefetch(self, paths, max_workers=4):
+        """Fill the index for `paths` in parallel (header scans are mostly I/O bound)."""
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(self.get, paths))
+
+    def save(self):
+        """Write the index back to disk (atomically) if it changed."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {'version': self.VERSION, 'entries': dict(self._entries)}
+            self._dirty = False
+        try:
+            _write_json_atomic(self.path, payload)
+        except OSError as e:
+            print(f"Warning: Could not save image metadata index: {e}")
+
+
+_METADATA_INDEX = None
+_METADATA_INDEX_LOCK = threading.Lock()
+
+
+def get_metadata_index():
+    """Process-wide `ImageMetadataIndex`, loaded from `METADATA_INDEX_PATH` on first use."""
+    global _METADATA_INDEX
+    with _METADATA_INDEX_LOCK:
+        if _METADATA_INDEX is None:
+            _METADATA_INDEX = ImageMetadataIndex(METADATA_INDEX_PATH)
+        return _METADATA_INDEX
+
+
+def get_image_size_fast(path):
+    """
+    Gets image dimensions without loading pixel data into memory (Lazy Read).
+    Served from the persistent metadata index when the file is unchanged.
+    """
+    meta = get_metadata_index().get(path)
+    if meta is None:
         return (0, 0)
+    return meta['width'], meta['height']
 
 
 def any_image_exceeds_webp_limit(images, is_custom_width, new_width):
@@ -369,7 +643,7 @@ def process_and_resize(args):
     Worker function to open and resize an image in a separate thread.
     """
     path, target_width, target_height = args
-    img = open_image_robust(path)
+    img = open_image_for_size(path, target_width, target_height)
     if img:
         try:
             if img.size != (target_width, target_height):
@@ -384,20 +658,16 @@ def process_and_resize(args):
     return None
 
 
-def get_concat_v_optimized(image_paths, new_width, is_custom_width, max_workers=4):
+def _plan_stitch_layout(image_paths, new_width, is_custom_width):
     """
-    Multi-threaded Stitcher:
-    1. Fast-scans dimensions (Lazy Load).
-    2. Resizes images in parallel threads (Speed Boost).
-    3. Pastes them sequentially.
+    Fast-scans page dimensions (Lazy Load) and computes the stitched layout.
+    Returns `(target_width, pages)` where `pages` is a list of
+    `(path, resized_height)` for every readable page, in order, or
+    `(0, [])` when nothing can be stitched.
     """
-    if not image_paths:
-        return None
-
-    # --- Pass 1: Calculate Dimensions (Fast) ---
     dimensions = []
     max_w = 0
-    
+
     for path in image_paths:
         w, h = get_image_size_fast(path)
         if w > 0 and h > 0:
@@ -409,62 +679,395 @@ def get_concat_v_optimized(image_paths, new_width, is_custom_width, max_workers=
 
     target_width = new_width if is_custom_width else max_w
     if target_width <= 0:
-        return None
+        return 0, []
 
-    # Calculate final heights
-    final_heights = []
-    valid_indices = [] 
-    
-    for i, (w, h) in enumerate(dimensions):
+    pages = []
+    for path, (w, h) in zip(image_paths, dimensions):
         if w > 0:
             # Keep very short source images representable after downscaling.
             # A zero-height resize leaves the black canvas unfilled.
             new_h = max(1, int(round((target_width / float(w)) * h)))
-            final_heights.append(new_h)
-            valid_indices.append(i)
-    
-    total_height = sum(final_heights)
-    if total_height <= 0:
+            pages.append((path, new_h))
+
+    return target_width, pages
+
+
+def _paste_page(dst, img, y):
+    """
+    Paste a resized page onto the RGB canvas at row `y`, flattening alpha onto the canvas.
+
+    RGBA/LA pages are blended by Pillow straight from the page buffer (the
+    page doubles as its own mask), so no RGB copy or alpha-channel copy is
+    made. Other non-RGB modes (P, CMYK, ...) are converted one band of
+    `PASTE_BAND_ROWS` rows at a time instead of as a full-page copy.
+    """
+    if img.mode in ('RGB', 'RGBA', 'LA'):
+        dst.paste(img, (0, y), img if img.mode != 'RGB' else None)
+        return
+    width, height = img.size
+    for top in range(0, height, PASTE_BAND_ROWS):
+        band = img.crop((0, top, width, min(height, top + PASTE_BAND_ROWS)))
+        converted = band.convert('RGB')
+        dst.paste(converted, (0, y + top))
+        converted.close()
+        band.close()
+
+
+def _available_memory_bytes():
+    """Best-effort amount of free physical memory in bytes, or None when it cannot be determined."""
+    try:
+        if os.name == 'nt':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            stat = MEMORYSTATUSEX()
+            stat.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat)):
+                return int(stat.ullAvailPhys)
+            return None
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
         return None
 
-    # Create the final canvas (white background for clean comic borders)
+
+def _write_page_rows(array, img, y):
+    """Write a resized page into an (H, W, 3) uint8 array at row `y`, flattening alpha onto white."""
+    if img.mode == 'RGB':
+        array[y:y + img.height] = np.asarray(img)
+        return
+    width, height = img.size
+    for top in range(0, height, PASTE_BAND_ROWS):
+        bottom = min(height, top + PASTE_BAND_ROWS)
+        part = img.crop((0, top, width, bottom))
+        band = Image.new('RGB', part.size, (255, 255, 255))
+        _paste_page(band, part, 0)
+        array[y + top:y + bottom] = np.asarray(band)
+        band.close()
+        part.close()
+
+
+def _attach_shared_memory(name):
+    """Attach to a shared-memory block owned (and unlinked) by the parent process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track`; pool workers share the parent's
+        # resource tracker, so the extra registration is harmless.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _decode_page_into_slab(args):
+    """
+    Process-pool worker: decode and resize one page straight into the shared
+    canvas slab at its precomputed y-offset. Only the slab reference travels
+    between processes, never pixel data. Returns True if the page was written.
+    """
+    slab, width, height, path, page_height, y = args
+    kind, ref = slab
+    img = process_and_resize((path, width, page_height))
+    if not img:
+        return False
     try:
-        dst = Image.new('RGB', (target_width, total_height), (255, 255, 255))
+        if kind == 'shm':
+            shm = _attach_shared_memory(ref)
+            try:
+                array = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+                _write_page_rows(array, img, y)
+                del array
+            finally:
+                shm.close()
+        else:
+            array = np.memmap(ref, dtype=np.uint8, mode='r+', shape=(height, width, 3))
+            _write_page_rows(array, img, y)
+            array.flush()
+            del array
+        return True
     except Exception as e:
-        print(f"Memory Error creating canvas: {e}")
+        print(f"Error writing {path} into the shared canvas: {e}")
+        return False
+    finally:
+        img.close()
+
+
+def _stitch_with_process_pool(pages, target_width, max_workers, use_memmap, scratch_dir=None, shared=False):
+    """
+    Process-pool backend for `get_concat_v_optimized`.
+
+    The canvas is a `SharedMemoryCanvas` (or a `MemmapCanvas` when it does
+    not fit in RAM); each worker process writes its page directly at the
+    page's y-offset, so the parent never pastes or unpickles pixels. Pages
+    that fail to decode are squeezed out afterwards so the result matches
+    the threaded stitcher. With `shared` the shared-memory canvas itself is
+    returned; otherwise its pixels are copied into a PIL image.
+    """
+    total_height = sum(h for _, h in pages)
+    offsets = []
+    y = 0
+    for _, h in pages:
+        offsets.append(y)
+        y += h
+
+    if use_memmap:
+        canvas = MemmapCanvas(target_width, total_height, scratch_dir=scratch_dir)
+        slab = ('file', canvas.path)
+    else:
+        canvas = SharedMemoryCanvas(target_width, total_height)
+        slab = ('shm', canvas.name)
+
+    returned = False
+    try:
+        tasks = [(slab, target_width, total_height, path, h, off) for (path, h), off in zip(pages, offsets)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            written = list(executor.map(_decode_page_into_slab, tasks))
+
+        array = canvas.array
+
+        # Squeeze out pages that failed (rows move up, so copying in order is safe)
+        current_height = 0
+        for ok, (_, h), off in zip(written, pages, offsets):
+            if not ok:
+                continue
+            if off != current_height:
+                array[current_height:current_height + h] = array[off:off + h]
+            current_height += h
+
+        if current_height <= 0:
+            del array
+            return None
+
+        if use_memmap or shared:
+            del array
+            canvas.truncate(current_height)
+            returned = True
+            return canvas
+
+        # One copy into PIL's own storage; the slab is released right after.
+        dst = Image.fromarray(array[:current_height], 'RGB')
+        del array
+        return dst
+    finally:
+        if not returned:
+            canvas.close()
+
+
+class MemmapCanvas:
+    """
+    Disk-backed RGB canvas for chapters larger than RAM.
+
+    Pixels live in a NumPy memmap inside a scratch directory, so the OS pages
+    them in and out as needed. Offers the same strip interface as
+    `VirtualStrip` (`size`, `width`, `height`, `mode`, `crop`, `close`):
+    cut detection scans it through a rolling window and `slicer` crops copy
+    only the requested rows into RAM.
+    """
+
+    def __init__(self, width, height, scratch_dir=None):
+        self.mode = 'RGB'
+        self.width = width
+        self.height = height
+        self._dir = tempfile.mkdtemp(prefix="photoslicer_canvas_", dir=scratch_dir)
+        self._array = np.memmap(self.path, dtype=np.uint8, mode='w+', shape=(height, width, 3))
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def path(self):
+        """File backing the memmap (workers can map it themselves)."""
+        return os.path.join(self._dir, "canvas.raw")
+
+    @property
+    def array(self):
+        """The writable (height, width, 3) uint8 memmap."""
+        return self._array
+
+    def paste_page(self, img, y):
+        """Write a resized page at row `y`, flattening alpha onto white like the in-memory canvas."""
+        _write_page_rows(self._array, img, y)
+
+    def truncate(self, height):
+        """Drop the rows below `height` (pages that failed to decode)."""
+        self.height = height
+
+    def crop(self, box):
+        """Copy the region `box` = (left, upper, right, lower) out of the memmap as an RGB image."""
+        left, upper, right, lower = box
+        upper = max(0, upper)
+        lower = min(self.height, lower)
+        return Image.fromarray(np.ascontiguousarray(self._array[upper:lower, left:right]), 'RGB')
+
+    def close(self):
+        """Unmap the canvas and delete its scratch directory."""
+        if self._array is not None:
+            mapping = getattr(self._array, '_mmap', None)
+            self._array = None
+            if mapping is not None:
+                try:
+                    mapping.close()
+                except BufferError:
+                    pass
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class SharedMemoryCanvas(MemmapCanvas):
+    """
+    In-RAM RGB canvas held in a `multiprocessing.shared_memory` block, with
+    the `MemmapCanvas` strip interface. Worker processes attach to it by
+    `name`, so the process export backend can publish a composite stitched
+    into it without copying it into a second block.
+    """
+
+    def __init__(self, width, height):
+        self.mode = 'RGB'
+        self.width = width
+        self.height = height
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, width * height * 3))
+        self._array = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self._shm.buf)
+
+    @property
+    def path(self):
+        """Shared-memory canvases have no backing file; see `name`."""
         return None
 
+    @property
+    def name(self):
+        """Name of the shared-memory block (workers attach with `_attach_shared_memory`)."""
+        return self._shm.name
+
+    def close(self):
+        """Release and unlink the shared-memory block."""
+        if self._shm is not None:
+            self._array = None
+            shm, self._shm = self._shm, None
+            shm.close()
+            shm.unlink()
+
+
+def _bounded_ordered_map(executor, fn, items, window):
+    """
+    Ordered `executor.map` with backpressure: at most `window` tasks are in
+    flight, and a new one is submitted only when the oldest result is taken.
+    Unlike `executor.map`, which submits everything up front, this keeps
+    finished-but-unconsumed results from piling up when workers outrun the
+    consumer.
+    """
+    window = max(1, window)
+    items = iter(items)
+    pending = deque(executor.submit(fn, item) for item in islice(items, window))
+    while pending:
+        result = pending.popleft().result()
+        for item in islice(items, 1):
+            pending.append(executor.submit(fn, item))
+        yield result
+
+
+def get_concat_v_optimized(image_paths, new_width, is_custom_width, max_workers=4, scratch_dir=None, decode_backend='thread', shared=False):
+    """
+    Multi-threaded Stitcher:
+    1. Fast-scans dimensions (Lazy Load).
+    2. Resizes images in parallel threads (Speed Boost).
+    3. Pastes them sequentially.
+
+    When the canvas would not fit in the available memory (or allocating it
+    fails), a disk-backed `MemmapCanvas` in `scratch_dir` is returned instead
+    of a PIL image.
+
+    `decode_backend='process'` decodes in a process pool that writes pages
+    straight into a shared canvas (see `_stitch_with_process_pool`); use it
+    when GIL-bound decoding (PSD compositing) stops scaling with threads.
+    Under the 'spawn' start method (Windows, macOS, frozen builds) every
+    worker re-imports the launching script, so that script must do no GUI
+    or other setup at import time and must call
+    `multiprocessing.freeze_support()` first thing in its `__main__` guard.
+    main.py keeps its window setup in `main()` behind that guard.
+
+    With `shared`, an in-memory canvas is a `SharedMemoryCanvas` instead of a
+    PIL image, so `slicer`'s process export backend can hand it to workers
+    without a second full-size copy.
+    """
+    if not image_paths:
+        return None
+
+    # --- Pass 1: Calculate Dimensions (Fast) ---
+    target_width, pages = _plan_stitch_layout(image_paths, new_width, is_custom_width)
+    if target_width <= 0:
+        return None
+
+    total_height = sum(h for _, h in pages)
+    if total_height <= 0:
+        return None
+
+    # PIL stores RGB as 4 bytes per pixel; fall back to a memmap canvas when
+    # that would crowd out the available RAM or the allocation itself fails.
+    available = _available_memory_bytes()
+    fits_in_memory = available is None or target_width * total_height * 4 <= available * MEMMAP_CANVAS_RATIO
+
+    if decode_backend == 'process':
+        try:
+            return _stitch_with_process_pool(pages, target_width, max_workers, not fits_in_memory, scratch_dir=scratch_dir, shared=shared)
+        except MemoryError as e:
+            print(f"Memory Error creating shared canvas, using disk-backed canvas: {e}")
+            return _stitch_with_process_pool(pages, target_width, max_workers, True, scratch_dir=scratch_dir)
+
+    # Create the final canvas (white background for clean comic borders).
+    dst = None
+    if fits_in_memory:
+        try:
+            if shared:
+                # Every row is written by a page (failed pages are cropped off below)
+                dst = SharedMemoryCanvas(target_width, total_height)
+            else:
+                dst = Image.new('RGB', (target_width, total_height), (255, 255, 255))
+        except (MemoryError, ValueError, OSError) as e:
+            print(f"Memory Error creating canvas, using disk-backed canvas: {e}")
+    if dst is None:
+        try:
+            dst = MemmapCanvas(target_width, total_height, scratch_dir=scratch_dir)
+        except Exception as e:
+            print(f"Error creating disk-backed canvas: {e}")
+            return None
+
     # --- Pass 2: Parallel Resize & Sequential Paste ---
     current_height = 0
     
     # Prepare tasks
-    tasks = []
-    for i, h in zip(valid_indices, final_heights):
-        tasks.append((image_paths[i], target_width, h))
+    tasks = [(path, target_width, h) for path, h in pages]
 
     # Use ThreadPoolExecutor for parallel processing
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # executor.map yields results in order, which is crucial for stitching
-        results = executor.map(process_and_resize, tasks)
+        # Results come back in order (crucial for stitching) with at most
+        # 2 x max_workers decoded pages waiting for the paste loop.
+        results = _bounded_ordered_map(executor, process_and_resize, tasks, 2 * max_workers)
         
         for img in results:
             if img:
-                if img.mode in ('RGBA', 'LA'):
-                    dst.paste(img.convert('RGB'), (0, current_height), mask=img.getchannel('A'))
+                if isinstance(dst, MemmapCanvas):
+                    dst.paste_page(img, current_height)
                 else:
-                    if img.mode != 'RGB':
-                        converted = img.convert('RGB')
-                        dst.paste(converted, (0, current_height))
-                        converted.close()
-                    else:
-                        dst.paste(img, (0, current_height))
+                    _paste_page(dst, img, current_height)
                 current_height += img.height
                 img.close()
 
     # If any image failed to load/resize, crop the canvas to the actual pasted height
     if current_height < total_height:
         if current_height > 0:
-            dst = dst.crop((0, 0, target_width, current_height))
+            if isinstance(dst, MemmapCanvas):
+                dst.truncate(current_height)
+            else:
+                dst = dst.crop((0, 0, target_width, current_height))
         else:
             dst.close()
             return None
@@ -472,14 +1075,334 @@ def get_concat_v_optimized(image_paths, new_width, is_custom_width, max_workers=
     return dst
 
 
-def find_safe_cut_points(image, slices_count):
+class VirtualStrip:
+    """
+    Lazy stand-in for the stitched canvas ("virtual strip" mode).
+
+    Knows every page's resized height and y-offset but never allocates the
+    full `target_width x total_height` canvas. `crop()` builds a slice only
+    from the pages it overlaps, decoding and resizing them on demand, so peak
+    memory follows the slice height instead of the chapter length. A small
+    LRU of resized pages keeps pages that straddle a cut from being decoded
+    once per neighbouring slice.
+
+    Exposes the subset of the `PIL.Image` interface used by `slicer`
+    (`size`, `width`, `height`, `mode`, `crop`, `close`).
+    """
+
+    PAGE_CACHE_SIZE = 4
+
+    def __init__(self, pages, target_width):
+        self.mode = 'RGB'
+        self.width = target_width
+        self.pages = list(pages)
+        self.offsets = []
+        y = 0
+        for _, h in self.pages:
+            self.offsets.append(y)
+            y += h
+        self.height = y
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def _page(self, index):
+        """Decoded + resized page `index` (native mode), served from the LRU when possible."""
+        with self._lock:
+            img = self._cache.get(index)
+            if img is not None:
+                self._cache.move_to_end(index)
+                return img
+
+        path, h = self.pages[index]
+        img = process_and_resize((path, self.width, h))
+
+        with self._lock:
+            if index in self._cache:
+                # Another slice decoded the same page concurrently; keep one copy.
+                if img:
+                    img.close()
+                return self._cache[index]
+            if img:
+                self._cache[index] = img
+                while len(self._cache) > self.PAGE_CACHE_SIZE:
+                    _, old = self._cache.popitem(last=False)
+                    old.close()
+        return img
+
+    def crop(self, box):
+        """Build the RGB region `box` = (left, upper, right, lower) from the overlapping pages."""
+        left, upper, right, lower = box
+        upper = max(0, upper)
+        lower = min(self.height, lower)
+        region = Image.new('RGB', (right - left, max(0, lower - upper)), (255, 255, 255))
+
+        index = max(0, bisect_right(self.offsets, upper) - 1)
+        while index < len(self.pages) and self.offsets[index] < lower:
+            page_top = self.offsets[index]
+            page_bottom = page_top + self.pages[index][1]
+            img = self._page(index)
+            if img:
+                part = img.crop((left, max(upper, page_top) - page_top, right, min(lower, page_bottom) - page_top))
+                _paste_page(region, part, max(upper, page_top) - upper)
+                part.close()
+            index += 1
+        return region
+
+    def close(self):
+        """Release every cached page."""
+        with self._lock:
+            for img in self._cache.values():
+                img.close()
+            self._cache.clear()
+
+
+def build_virtual_strip(image_paths, new_width, is_custom_width):
+    """
+    Virtual-strip counterpart of `get_concat_v_optimized`: plans the same
+    layout but returns a `VirtualStrip` instead of a materialized canvas.
+
+    Pages that fail to decode later leave a white band instead of shifting
+    the following pages up, since offsets are fixed up front.
+    """
+    if not image_paths:
+        return None
+
+    target_width, pages = _plan_stitch_layout(image_paths, new_width, is_custom_width)
+    if target_width <= 0 or not pages:
+        return None
+
+    return VirtualStrip(pages, target_width)
+
+
+# Optimal cut planner costs: every slice costs CUT_PLAN_SLICE_COST (plus its
+# squared relative shortfall from the height limit); a cut forced through
+# artwork costs as much as CUT_PLAN_FORCED_PENALTY extra slices, and so does
+# a sliver: a slice other than the last shorter than CUT_PLAN_MIN_SLICE_FRACTION
+# of the height limit.
+CUT_PLAN_SLICE_COST = 1.0
+CUT_PLAN_FORCED_PENALTY = 5.0
+CUT_PLAN_MIN_SLICE_FRACTION = 0.25
+CUT_PLAN_FORCED_GRID_DIVISIONS = 8  # forced-cut candidates per height limit inside an unsafe stretch
+
+# Cut detection screens rows on a proxy this many times narrower before
+# checking the surviving candidates at full resolution. The slack covers
+# the rounding of the box average and the gray conversion, keeping the
+# proxy a strict superset of the truly uniform rows.
+CUT_PROXY_FACTOR = 2
+CUT_PROXY_ROUNDING_SLACK = 4
+
+# Rows per band when building the cut detector's row-uniformity map; bounds
+# the temporary grayscale/int16 buffers to one band of the strip.
+ROW_MAP_BAND_ROWS = 2048
+
+
+def _row_uniform_map(gray, ignorable_pixels, threshold):
+    """
+    Vectorized row-uniformity test for every row of a grayscale array.
+
+    Row `r` is uniform when no two horizontally adjacent pixels inside the
+    non-ignorable column range differ by more than `threshold`. Rows too
+    narrow to have such a range are never uniform.
+    """
+    height, width = gray.shape
+    if width <= ignorable_pixels * 2 + 1:
+        return np.zeros(height, dtype=bool)
+    inner = gray[:, ignorable_pixels:width - ignorable_pixels].astype(np.int16)
+    return (np.abs(np.diff(inner, axis=1)) <= threshold).all(axis=1)
+
+
+def _proxy_row_candidates(image, box, ignorable_pixels, threshold, factor):
+    """
+    Cheap superset of the uniform rows inside `box`, found on a proxy that is
+    `factor` times narrower (box-averaged columns, full row resolution).
+
+    If adjacent full-resolution gray pixels never differ by more than
+    `threshold`, adjacent proxy columns differ by at most
+    `factor * threshold` plus rounding, so only proxy columns whose whole
+    block lies in the non-ignorable range are compared against that bound.
+    A row that fails here cannot be uniform at full resolution. Returns None
+    when the proxy is too narrow to decide.
+    """
+    left, top, right, bottom = box
+    width = right - left
+    first_col = -(-ignorable_pixels // factor)
+    last_col = (width - ignorable_pixels) // factor - 1
+    if last_col - first_col < 1:
+        return None
+    if isinstance(image, Image.Image):
+        proxy = image.reduce((factor, 1), box=box)
+    else:
+        band = image.crop(box)
+        proxy = band.reduce((factor, 1))
+        band.close()
+    gray = np.array(proxy.convert('L'))[:, first_col:last_col + 1].astype(np.int16)
+    proxy.close()
+    bound = factor * threshold + CUT_PROXY_ROUNDING_SLACK
+    return (np.abs(np.diff(gray, axis=1)) <= bound).all(axis=1)
+
+
+def _strip_row_uniform_map(image, ignorable_pixels, threshold, proxy_factor=1):
+    """
+    Row-uniformity map for a whole strip, computed band by band so only one
+    band of grayscale rows is resident at a time. Works for PIL images and
+    strip sources (VirtualStrip, MemmapCanvas) alike.
+
+    With `proxy_factor > 1`, each band is first screened on a narrower proxy
+    (`_proxy_row_candidates`) and only the candidate rows are converted and
+    checked at full resolution, giving exactly the same map for less work.
+    """
+    width, height = image.size
+    uniform = np.zeros(height, dtype=bool)
+    if width <= ignorable_pixels * 2 + 1:
+        return uniform
+    for top in range(0, height, ROW_MAP_BAND_ROWS):
+        bottom = min(height, top + ROW_MAP_BAND_ROWS)
+        candidates = None
+        if proxy_factor > 1:
+            candidates = _proxy_row_candidates(image, (0, top, width, bottom), ignorable_pixels, threshold, proxy_factor)
+        if candidates is None:
+            band = image.crop((0, top, width, bottom))
+            uniform[top:bottom] = _row_uniform_map(np.array(band.convert('L')), ignorable_pixels, threshold)
+            band.close()
+            continue
+        # Verify runs of candidate rows at full resolution
+        rows = np.flatnonzero(candidates)
+        if rows.size == 0:
+            continue
+        breaks = np.flatnonzero(np.diff(rows) > 1)
+        run_starts = np.concatenate(([rows[0]], rows[breaks + 1]))
+        run_ends = np.concatenate((rows[breaks], [rows[-1]])) + 1
+        for r0, r1 in zip(run_starts, run_ends):
+            band = image.crop((0, top + int(r0), width, top + int(r1)))
+            uniform[top + r0:top + r1] = _row_uniform_map(np.array(band.convert('L')), ignorable_pixels, threshold)
+            band.close()
+    return uniform
+
+
+def _plan_cuts_optimal(safe, height, max_height, min_height=10, step=5):
+    """
+    Globally optimal cut planner over precomputed safe rows.
+
+    Candidate cuts are the safe rows (run boundaries plus every `step`-th row
+    inside a run). A forward dynamic program picks the chain of cuts from 0
+    to `height` that minimises, per slice, `CUT_PLAN_SLICE_COST` plus the
+    squared relative shortfall from `max_height` (the final tail slice is
+    exempt), with every slice at most `max_height` tall. Stretches without
+    any safe row get forced cut nodes spaced `max_height` apart that cost
+    `CUT_PLAN_FORCED_PENALTY` each, so forced cuts through artwork are only
+    used where no safe chain exists. Besides full-height steps from both
+    ends of the stretch (and from the earliest node that can reach into
+    it), forced nodes sit on a grid of `max_height /
+    CUT_PLAN_FORCED_GRID_DIVISIONS`, so a plan can cross it without first
+    stepping to its last safe row.
+    Slices other than the last that are shorter than
+    `CUT_PLAN_MIN_SLICE_FRACTION` of `max_height` also cost
+    `CUT_PLAN_FORCED_PENALTY`, so the plan does not trade a slice for a
+    sliver. Each node only looks `max_height` ahead.
+
+    Cost: the program is a Python loop over the candidate nodes, each
+    relaxing its reachable window (up to `max_height / step` nodes) in one
+    vectorized step, so runtime grows with nodes x window, not just with
+    the strip height. On a 200k-px strip with comic-style gutters that is
+    about 0.1 s, but a strip where nearly every row is safe (long blank or
+    flat-colour stretches) produces a node every `step` rows and takes 1-2 s.
+    That is why the greedy walk in `find_safe_cut_points` stays the default.
+
+    Returns the cut list in `find_safe_cut_points` format (without 0, ending
+    at `height`), or None when no valid plan exists.
+    """
+    if max_height <= 0 or height <= 0:
+        return None
+
+    rows = np.flatnonzero(safe[:height])
+    rows = rows[(rows >= min_height) & (rows < height)]
+    if rows.size:
+        breaks = np.diff(rows) > 1
+        run_start = np.concatenate(([True], breaks))
+        run_end = np.concatenate((breaks, [True]))
+        rows = rows[run_start | run_end | (rows % step == 0)]
+
+    # Anchor nodes, then forced nodes wherever two consecutive nodes are too
+    # far apart: full-height steps forward from the gap's start and from the
+    # earliest node whose window reaches into the gap, full-height steps back
+    # from the gap's end, and a coarse grid in between
+    nodes = np.concatenate(([0], rows, [height])).astype(np.int64)
+    grid = max(step, max_height // CUT_PLAN_FORCED_GRID_DIVISIONS)
+    forced_nodes = set()
+    for k in np.flatnonzero(np.diff(nodes) > max_height):
+        prev, nxt = int(nodes[k]), int(nodes[k + 1])
+        earliest = int(nodes[np.searchsorted(nodes, prev - max_height, side='right')])
+        for anchor in {prev, earliest}:
+            forced_nodes.update(range(anchor + max_height, nxt, max_height))
+        forced_nodes.update(range(nxt - max_height, prev, -max_height))
+        forced_nodes.update(range(prev + grid, nxt, grid))
+    forced_nodes.difference_update(nodes.tolist())
+    positions = np.array(sorted(set(nodes.tolist()) | forced_nodes), dtype=np.int64)
+    forced = np.isin(positions, list(forced_nodes))
+    forced_cost = np.where(forced, CUT_PLAN_FORCED_PENALTY, 0.0)
+    min_slice = max_height * CUT_PLAN_MIN_SLICE_FRACTION
+
+    n = positions.size
+    cost = np.full(n, np.inf)
+    prev_node = np.full(n, -1, dtype=np.int64)
+    cost[0] = 0.0
+    first = np.searchsorted(positions, positions + min_height, side='left')
+    last = np.searchsorted(positions, positions + max_height, side='right')
+
+    for i in range(n - 1):
+        if not np.isfinite(cost[i]):
+            continue
+        j0, j1 = first[i], last[i]
+        if j0 >= j1:
+            continue
+        lengths = positions[j0:j1] - positions[i]
+        shortfall = (max_height - lengths) / float(max_height)
+        step_cost = CUT_PLAN_SLICE_COST + shortfall * shortfall + forced_cost[j0:j1]
+        step_cost[lengths < min_slice] += CUT_PLAN_FORCED_PENALTY
+        if j1 == n:
+            step_cost[-1] = CUT_PLAN_SLICE_COST  # the tail slice may be short
+        candidate = cost[i] + step_cost
+        better = candidate < cost[j0:j1]
+        if better.any():
+            cost[j0:j1] = np.where(better, candidate, cost[j0:j1])
+            prev_node[j0:j1] = np.where(better, i, prev_node[j0:j1])
+
+    if not np.isfinite(cost[n - 1]):
+        return None
+
+    cuts = []
+    node = n - 1
+    while node > 0:
+        cuts.append(int(positions[node]))
+        node = prev_node[node]
+    cuts.reverse()
+    return cuts
+
+
+def find_safe_cut_points(image, slices_count, planner='greedy', max_height=None, proxy_factor=None, analysis=None):
     """
     Modified with vertical context check to avoid cutting through balloons.
+
+    Row uniformity is evaluated once for the whole strip (one vectorized
+    pass per band); the cut search and the vertical-context check are then
+    plain array lookups.
+
+    `planner='optimal'` replaces the default greedy walk with
+    `_plan_cuts_optimal`, which keeps every slice within `max_height`
+    (default: the even split height) while using as few slices and forced
+    cuts as possible, at a higher planning cost on long strips with many
+    safe rows (see its docstring).
+
+    Rows are screened on a `proxy_factor`-times narrower proxy first
+    (default `CUT_PROXY_FACTOR`; 1 disables it); only candidates are checked
+    at full resolution, so the cuts are identical either way. When a
+    `ChapterAnalysis` is given, its cached grayscale bands are used instead.
     """
-    gray_img = image.convert('L')
-    combined_img = np.array(gray_img)
-    
-    height, width = combined_img.shape
+    width, height = image.size
     if height == 0 or slices_count <= 0:
         return []
     
@@ -502,30 +1425,35 @@ def find_safe_cut_points(image, slices_count):
     
     # --- Vertical context check offsets (rows above and below candidate cut point) ---
     vertical_check_offsets = [-25, -15, -8, 8, 15, 25]
+
+    # Step 1: row uniformity for every row
+    if analysis is not None:
+        uniform = analysis.row_uniform_map(ignorable_pixels, threshold)
+    else:
+        if proxy_factor is None:
+            proxy_factor = CUT_PROXY_FACTOR
+        uniform = _strip_row_uniform_map(image, ignorable_pixels, threshold, proxy_factor)
+
+    # Step 2: a row is a safe cut when it and every in-bounds neighbour at the
+    # vertical check offsets are uniform (verifies a clean gap)
+    safe = uniform.copy()
+    for offset in vertical_check_offsets:
+        if offset > 0:
+            safe[:height - offset] &= uniform[offset:]
+        else:
+            safe[-offset:] &= uniform[:height + offset]
+
+    if planner == 'optimal':
+        planned = _plan_cuts_optimal(safe, height, max_height or split_height)
+        if planned:
+            return planned
     
     slice_locations = [0]
     row = split_height
     move_up = True
     
     while row < last_row:
-        if row >= last_row:
-            break
-            
-        # Step 1: Check row uniformity
-        can_slice = _is_row_uniform(combined_img, row, width, ignorable_pixels, threshold)
-        
-        # Step 2: Check vertical neighborhood to verify clean gap
-        if can_slice:
-            for offset in vertical_check_offsets:
-                check_row = row + offset
-                if 0 <= check_row < last_row:
-                    if not _is_row_uniform(combined_img, check_row, width, 
-                                            ignorable_pixels, threshold):
-                        can_slice = False
-                        break
-        # ────────────────────────────────────────────────────────────
-        
-        if can_slice:
+        if safe[row]:
             slice_locations.append(row)
             row += split_height
             move_up = True
@@ -571,24 +1499,6 @@ def find_safe_cut_points(image, slices_count):
     return validated_cuts[1:]
 
 
-def _is_row_uniform(img_array, row, width, ignorable_pixels, threshold):
-    """Checks horizontal row uniformity for content detection."""
-    row_pixels = img_array[row]
-    
-    if len(row_pixels) <= ignorable_pixels * 2 + 1:
-        return False
-    
-    for index in range(ignorable_pixels + 1, width - ignorable_pixels):
-        prev_pixel = int(row_pixels[index - 1])
-        next_pixel = int(row_pixels[index])
-        value_diff = next_pixel - prev_pixel
-        
-        if value_diff > threshold or value_diff < -threshold:
-            return False
-    
-    return True
-
-
 def _cap_slice_gaps(cut_points, max_height):
     """
     Ensures the gap between any two consecutive cut points does not exceed `max_height`.
@@ -608,6 +1518,486 @@ def _cap_slice_gaps(cut_points, max_height):
     return capped
 
 
+def _encoder_params(save_format, profile=None):
+    """Encoder keyword arguments for `save_format` ('webp', 'jpg', 'png', 'psd', ...) under an `ENCODER_PROFILES` entry."""
+    presets = ENCODER_PROFILES.get(profile or DEFAULT_ENCODER_PROFILE)
+    if presets is None:
+        raise ValueError(f"Unknown encoder profile: {profile}")
+    fmt = save_format.lower()
+    if fmt in ('jpg', 'jpeg'):
+        fmt = 'jpeg'
+    elif fmt not in presets:
+        # Other formats have always been saved with the JPEG-style options
+        fmt = 'jpeg'
+    return dict(presets[fmt])
+
+
+def _reduce_mode_losslessly(img, palette=False):
+    """
+    `img` converted to the smallest mode that keeps every pixel: 'L' when
+    all of its pixels are gray and, with `palette` (PNG), a 'P' image when
+    it has at most 256 colours. Returns `img` itself when neither applies.
+    """
+    if img.mode != 'RGB':
+        return img
+    rgb = np.asarray(img)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    if np.array_equal(r, g) and np.array_equal(g, b):
+        # Exact: Pillow's 'L' weights sum to 1.0 in its fixed point
+        return img.convert('L')
+    if palette and img.getcolors(256) is not None:
+        keys = (r.astype(np.uint32) << 16) | (g.astype(np.uint32) << 8) | b
+        colours, index = np.unique(keys, return_inverse=True)
+        reduced = Image.fromarray(index.reshape(keys.shape).astype(np.uint8), 'P')
+        reduced.putpalette(np.stack([colours >> 16, (colours >> 8) & 0xFF, colours & 0xFF], axis=1).astype(np.uint8).tobytes())
+        return reduced
+    return img
+
+
+def save_encoded(img, target, save_format, quality, profile=None):
+    """
+    Encode `img` to `target` (a path or a binary file object) in
+    `save_format` with `quality` and the encoder settings of `profile`
+    (default: `DEFAULT_ENCODER_PROFILE`). PSD is handled by `save_psd_layered`.
+    """
+    fmt = save_format.lower()
+    params = _encoder_params(fmt, profile)
+    source = img
+    if params.pop('reduce_mode', False):
+        source = _reduce_mode_losslessly(img, palette=(fmt == 'png'))
+    try:
+        if fmt == 'webp':
+            source.save(target, format="webp", quality=quality, **params)
+        elif fmt == 'png':
+            source.save(target, format="png", **params)
+        else:
+            pil_format = 'jpeg' if fmt in ('jpg', 'jpeg') else None
+            if pil_format is None and not isinstance(target, (str, os.PathLike)):
+                pil_format = fmt
+            source.save(target, format=pil_format, quality=quality, **params)
+    finally:
+        if source is not img:
+            source.close()
+
+
+def _archive_path(save_path, mode, output_base, current_date, extension):
+    """Where the ZIP/CBZ/PDF for output folder `save_path` goes (next to it, or under the dated folder in multi mode)."""
+    name = f"{os.path.basename(save_path)}.{extension}"
+    if mode == 'single':
+        return os.path.join(os.path.dirname(save_path), name)
+    return os.path.join(output_base, current_date, name)
+
+
+class _OrderedOutput:
+    """
+    Base for single-file outputs (archives, PDF) fed from worker threads.
+
+    All entry names are known up front and ordered with `sort_key_improved`.
+    Workers `put` each encoded file as soon as it is ready; one that arrives
+    ahead of its turn waits in a small buffer until every earlier entry has
+    been written or `skip`ped, so output order never depends on thread timing
+    and only out-of-order entries are ever held in memory.
+    Subclasses implement `_write(name, data)` and `_finish()`.
+    """
+
+    def __init__(self, path, names):
+        order = sorted(names, key=sort_key_improved)
+        self._rank = {name: i for i, name in enumerate(order)}
+        self._pending = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.path = path
+        self.written = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def put(self, name, data):
+        """Queue entry `name` (bytes `data`, or None for a failed file) and write everything now in order."""
+        with self._lock:
+            self._pending[self._rank[name]] = (name, data)
+            while self._next in self._pending:
+                self._emit(*self._pending.pop(self._next))
+                self._next += 1
+
+    def skip(self, name):
+        """Mark `name` as never coming (its file failed)."""
+        self.put(name, None)
+
+    def _emit(self, name, data):
+        if data is not None:
+            self._write(name, data)
+            self.written += 1
+
+    def close(self):
+        """Write whatever is still buffered (entries behind a missing one) and finish the file."""
+        with self._lock:
+            for rank in sorted(self._pending):
+                self._emit(*self._pending.pop(rank))
+            self._finish()
+
+
+class OrderedArchiveWriter(_OrderedOutput):
+    """
+    Streams encoded files from memory straight into a ZIP/CBZ archive, in
+    final `sort_key_improved` order, without a temporary folder.
+    Already-compressed formats (`ARCHIVE_STORED_FORMATS`) are stored, the
+    rest deflated.
+    """
+
+    def __init__(self, path, arcnames, save_format):
+        super().__init__(path, arcnames)
+        compression = zipfile.ZIP_STORED if save_format.lower() in ARCHIVE_STORED_FORMATS else zipfile.ZIP_DEFLATED
+        self._zip = zipfile.ZipFile(path, 'w', compression)
+
+    def _write(self, name, data):
+        self._zip.writestr(name, data)
+
+    def _finish(self):
+        self._zip.close()
+
+
+class StreamingPdfWriter(_OrderedOutput):
+    """
+    Writes a PDF one page per encoded image, as the images arrive, in final
+    `sort_key_improved` order — no temporary folder and no all-pages-in-RAM
+    step, so memory stays flat however many pages the export has.
+
+    JPEG data is embedded as-is (DCTDecode, no re-encoding); any other
+    format is decoded and embedded losslessly (FlateDecode), with alpha
+    flattened away. Pages are sized at `PDF_DPI`. Only each object's byte
+    offset is kept; the page tree and cross-reference table are written by
+    `close()`.
+    """
+
+    PDF_DPI = 96
+
+    def __init__(self, path, names):
+        super().__init__(path, names)
+        self._file = open(path, 'wb')
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3  # 1 = catalog, 2 = page tree (both written last)
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    @staticmethod
+    def _image_stream(data):
+        """(width, height, dict entries, stream bytes) for one encoded image."""
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            if img.format == 'JPEG' and img.mode in ('L', 'RGB', 'CMYK'):
+                color_space = {'L': '/DeviceGray', 'RGB': '/DeviceRGB', 'CMYK': '/DeviceCMYK'}[img.mode]
+                extra = " /Decode [1 0 1 0 1 0 1 0]" if (img.mode == 'CMYK' and 'adobe' in img.info) else ""
+                return width, height, f"/ColorSpace {color_space} /Filter /DCTDecode{extra}", data
+            img.load()
+            if img.mode in ('RGBA', 'LA', 'P', 'PA') or 'transparency' in img.info:
+                flat = Image.new('RGB', img.size, (255, 255, 255))
+                rgba = img.convert('RGBA')
+                flat.paste(rgba, mask=rgba.getchannel('A'))
+                rgba.close()
+            elif img.mode == 'L':
+                flat = img.copy()
+            else:
+                flat = img.convert('RGB')
+            color_space = '/DeviceGray' if flat.mode == 'L' else '/DeviceRGB'
+            stream = zlib.compress(flat.tobytes(), 6)
+            flat.close()
+            return width, height, f"/ColorSpace {color_space} /Filter /FlateDecode", stream
+
+    def _write(self, name, data):
+        width, height, image_entries, stream = self._image_stream(data)
+        scale = 72.0 / self.PDF_DPI
+        page_w = f"{width * scale:.4f}".rstrip('0').rstrip('.')
+        page_h = f"{height * scale:.4f}".rstrip('0').rstrip('.')
+        image_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/BitsPerComponent 8 {image_entries} /Length {len(stream)} >>"
+        ).encode(), stream)
+        content = f"q {page_w} 0 0 {page_h} 0 0 cm /Im0 Do Q".encode()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self._page_ids.append(page_id)
+
+    def _finish(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode())
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        count = self._next_id
+        lines = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, count):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        self._file.write("".join(lines).encode())
+        self._file.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self._file.close()
+
+
+def encode_to_budget(img, save_format, target_bytes, reference_quality, profile=None, ways=QUALITY_SEARCH_WAYS):
+    """
+    Encode `img` (JPEG/WebP) at the highest quality whose output fits in
+    `target_bytes`, searching QUALITY_SEARCH_MIN..QUALITY_SEARCH_MAX with
+    `ways` candidate encodes in parallel per round, all in memory.
+    `reference_quality` (the fixed-quality setting) is among the first
+    round's candidates, so its size comes for free for reporting.
+
+    Returns `(data, quality, reference_size)`. When not even the minimum
+    quality fits, the minimum-quality encoding is returned.
+    """
+    # PIL keeps per-save state on the Image object (`encoderinfo`), so
+    # concurrent saves of one image would race; every worker encodes its
+    # own copy, checked out of a small pool.
+    pool = queue.SimpleQueue()
+    pool.put(img)
+    for _ in range(ways - 1):
+        pool.put(img.copy())
+
+    def encode(quality):
+        source = pool.get()
+        try:
+            buffer = io.BytesIO()
+            save_encoded(source, buffer, save_format, quality, profile)
+        finally:
+            pool.put(source)
+        return quality, buffer.getvalue()
+
+    # Invariant: `fit` is the best quality known to fit, `over` the lowest
+    # known not to; the answer lies strictly between them until they meet.
+    fit, over = QUALITY_SEARCH_MIN - 1, QUALITY_SEARCH_MAX + 1
+    fit_data = over_data = None
+    reference_size = None
+    first_round = True
+    with ThreadPoolExecutor(max_workers=ways) as executor:
+        while over - fit > 1:
+            span = over - fit
+            candidates = {fit + max(1, round((i + 1) * span / (ways + 1))) for i in range(ways)}
+            if first_round and QUALITY_SEARCH_MIN <= reference_quality <= QUALITY_SEARCH_MAX:
+                candidates.add(reference_quality)
+            candidates = sorted(q for q in candidates if fit < q < over)
+            # Results come back in ascending quality. Sizes are not strictly
+            # monotonic in quality, so a fit above a lower overshoot is ignored.
+            for quality, data in executor.map(encode, candidates):
+                if quality == reference_quality and first_round:
+                    reference_size = len(data)
+                if quality >= over:
+                    continue
+                if len(data) <= target_bytes:
+                    fit, fit_data = quality, data
+                else:
+                    over, over_data = quality, data
+            first_round = False
+
+    if reference_size is None:
+        reference_size = len(encode(reference_quality)[1])
+    while not pool.empty():
+        source = pool.get()
+        if source is not img:
+            source.close()
+    if fit_data is not None:
+        return fit_data, fit, reference_size
+    return over_data, over, reference_size
+
+
+class _ByteBudgetTally:
+    """Thread-safe running totals for target-bytes mode (written vs fixed-quality bytes)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.written = 0
+        self.reference = 0
+
+    def add(self, sizes):
+        if not sizes:
+            return
+        with self._lock:
+            self.files += 1
+            self.written += sizes[0]
+            self.reference += sizes[1]
+
+    def report(self, quality, job_stats=None):
+        """
+        Print the size change against the fixed-quality run and record it in
+        `job_stats` (a dict), if given. The budget can raise quality above
+        the fixed setting, so the change is signed (negative is smaller);
+        `bytes_saved` only counts actual savings.
+        """
+        if not self.files:
+            return
+        delta = self.written - self.reference
+        percent = (delta / self.reference * 100) if self.reference else 0.0
+        print(
+            f"Target-bytes mode: {self.files} files, {self.written} bytes "
+            f"vs {self.reference} at fixed quality {quality} ({delta:+d} bytes, {percent:+.1f}% vs fixed quality)"
+        )
+        if job_stats is not None:
+            job_stats['target_bytes_files'] = job_stats.get('target_bytes_files', 0) + self.files
+            job_stats['target_bytes_written'] = job_stats.get('target_bytes_written', 0) + self.written
+            job_stats['fixed_quality_bytes'] = job_stats.get('fixed_quality_bytes', 0) + self.reference
+            job_stats['bytes_saved'] = job_stats.get('bytes_saved', 0) + max(0, -delta)
+
+
+def _export_slice(res, filepath, save_format, save_quality, watermark_opts=None, planned=None, encoder_profile=None, target_bytes=None):
+    """
+    Watermark (optionally) and encode one slice to `filepath` (a path or a
+    binary file object), then close it.
+    `watermark_opts` is `(path, count, edge, width_percent, margin,
+    search_mode, placement_cache)` or None when watermarking is off;
+    `planned` is the slice's precomputed `(wm, placements)` from
+    `plan_slice_watermarks`, if any.
+    With `target_bytes` set, JPEG/WebP slices are encoded by
+    `encode_to_budget`; returns `(bytes_written, fixed_quality_bytes)`
+    in that case, otherwise None.
+    """
+    zlib_level = _encoder_params('psd', encoder_profile)['zlib_level']
+    is_psd = save_format.lower() == "psd"
+    # For PSD output the watermark goes in as a separate layer (inside
+    # save_psd_layered) instead of being baked into the pixels, so the
+    # user can reposition it later in Photoshop.
+    if watermark_opts and not is_psd:
+        wm_path, wm_count, wm_edge, wm_width_percent, wm_margin, wm_search, wm_cache = watermark_opts
+        res = apply_watermark(res, wm_path, wm_count, wm_edge, wm_width_percent, margin=wm_margin, planned=planned,
+                              search_mode=wm_search, placement_cache=wm_cache)
+    if is_psd:
+        if watermark_opts:
+            wm_path, wm_count, wm_edge, wm_width_percent, wm_margin, wm_search, wm_cache = watermark_opts
+            save_psd_layered(res, filepath, True, wm_path, wm_count, wm_edge, wm_width_percent, watermark_margin=wm_margin, planned=planned,
+                             zlib_level=zlib_level, search_mode=wm_search, placement_cache=wm_cache)
+        else:
+            save_psd_layered(res, filepath, zlib_level=zlib_level)
+    elif target_bytes and save_format.lower() in BYTE_BUDGET_FORMATS:
+        data, _, reference_size = encode_to_budget(res, save_format, target_bytes, save_quality, encoder_profile)
+        res.close()
+        _write_bytes(filepath, data)
+        return len(data), reference_size
+    else:
+        save_encoded(res, filepath, save_format, save_quality, encoder_profile)
+    res.close()
+    return None
+
+
+def _write_bytes(target, data):
+    """Write `data` to a path or a binary file object."""
+    if hasattr(target, "write"):
+        target.write(data)
+    else:
+        with open(target, "wb") as f:
+            f.write(data)
+
+
+def _encode_slice_from_slab(args):
+    """
+    Process-pool worker: crop one slice out of the shared composite slab and
+    watermark/encode it to disk. Only the slab reference and the slice's
+    rows travel between processes, never pixel data. With no `filepath` the
+    slice is encoded in memory and its bytes are returned (archive output).
+    Returns `(data or None, target-bytes sizes or None)`.
+    """
+    slab, shape, start, end, filepath, save_format, save_quality, watermark_opts, planned, encoder_profile, target_bytes = args
+    kind, ref = slab
+    if kind == 'shm':
+        shm = _attach_shared_memory(ref)
+        try:
+            array = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            res = Image.fromarray(np.ascontiguousarray(array[start:end]), 'RGB')
+            del array
+        finally:
+            shm.close()
+    else:
+        array = np.memmap(ref, dtype=np.uint8, mode='r', shape=shape)
+        res = Image.fromarray(np.ascontiguousarray(array[start:end]), 'RGB')
+        del array
+    if filepath is None:
+        buffer = io.BytesIO()
+        sizes = _export_slice(res, buffer, save_format, save_quality, watermark_opts, planned, encoder_profile, target_bytes)
+        return buffer.getvalue(), sizes
+    sizes = _export_slice(res, filepath, save_format, save_quality, watermark_opts, planned, encoder_profile, target_bytes)
+    return None, sizes
+
+
+def _export_slices_with_process_pool(image, slices, save_format, save_quality, watermark_opts, max_workers, progress_callback=None, encoder_profile=None, on_encoded=None, target_bytes=None, tally=None):
+    """
+    Process-pool backend for `slicer`'s export stage.
+
+    WebP method 6, optimized/progressive JPEG, PSD deflate and the watermark
+    detector are CPU-bound and serialize on Python-side work between encoder
+    calls when run on threads. Here the composite is published once — a
+    `SharedMemoryCanvas` by its block name, a `MemmapCanvas` by its backing
+    file; any other in-memory composite is copied into a new
+    `multiprocessing.shared_memory` slab, doubling its memory for the
+    export (`mergerImages` stitches into a `SharedMemoryCanvas` to avoid
+    that) — and each worker process crops and encodes its slices from it.
+    Workers are spawned like those of `get_concat_v_optimized`'s process
+    backend, with the same requirements on the launching script.
+    `slices` is a list of `(start, end, filepath, planned)`; progress is
+    reported per finished slice.
+    A slice with filepath None is encoded in memory and handed to
+    `on_encoded(position, data)` in the parent (archive output).
+    Target-bytes sizes are added to `tally` (a `_ByteBudgetTally`).
+    """
+    shm = None
+    if isinstance(image, SharedMemoryCanvas):
+        shape = image.array.shape
+        slab = ('shm', image.name)
+    elif isinstance(image, MemmapCanvas):
+        shape = image.array.shape
+        slab = ('file', image.path)
+        image.array.flush()
+    else:
+        shape = (image.height, image.width, 3)
+        shm = shared_memory.SharedMemory(create=True, size=image.width * image.height * 3)
+        slab = ('shm', shm.name)
+        array = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        # Copy band by band so no second full-size RGB array is materialized
+        for top in range(0, image.height, PASTE_BAND_ROWS):
+            bottom = min(image.height, top + PASTE_BAND_ROWS)
+            band = image.crop((0, top, image.width, bottom))
+            if band.mode != 'RGB':
+                band = band.convert('RGB')
+            array[top:bottom] = np.asarray(band)
+            band.close()
+        del array
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _encode_slice_from_slab,
+                    (slab, shape, start, end, filepath, save_format, save_quality, watermark_opts, planned, encoder_profile, target_bytes)
+                )
+                for start, end, filepath, planned in slices
+            ]
+            positions = {future: i for i, future in enumerate(futures)}
+            completed_count = 0
+            total_count = len(futures)
+            for future in as_completed(futures):
+                data, sizes = future.result()
+                if on_encoded is not None and data is not None:
+                    on_encoded(positions[future], data)
+                if tally is not None:
+                    tally.add(sizes)
+                completed_count += 1
+                if progress_callback:
+                    progress_callback((completed_count / total_count) * 100)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
 def format_filename(pattern, number, digits, extension, folder_name="", total=1):
     """Replace placeholders in pattern with dynamic values (number, folder name, date, total count)."""
     import datetime
@@ -631,30 +2021,37 @@ def format_filename(pattern, number, digits, extension, folder_name="", total=1)
     return f"{name}.{extension.lower()}"
 
 
-def slicer(image, saveFormat, slicesCount, saveQuality, mode, current_date, saveDirectory=None, isZip=False, isPdf=False, isCbz=False, progress_callback=None, output_base="./Results", max_workers=4, filename_pattern="[number]", filename_digits=3, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0):
+def slicer(image, saveFormat, slicesCount, saveQuality, mode, current_date, saveDirectory=None, isZip=False, isPdf=False, isCbz=False, progress_callback=None, output_base="./Results", max_workers=4, filename_pattern="[number]", filename_digits=3, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0, cut_planner='greedy', encode_backend='thread', encoder_profile=DEFAULT_ENCODER_PROFILE, target_bytes=None, job_stats=None, watermark_search='exhaustive', placement_cache=True):
     """
     Slice a tall composite image into multiple vertical segments.
     Applies optional watermarking, format encoding, parallel export, and packaging (ZIP/PDF/CBZ).
+    `cut_planner` selects the cut search: 'greedy' (default, cheapest) or
+    'optimal' (see `_plan_cuts_optimal`; slower on long strips with many safe rows).
+    `encode_backend` selects how slices are encoded: 'thread' (default) or
+    'process' (see `_export_slices_with_process_pool`).
+    `encoder_profile` names an `ENCODER_PROFILES` entry.
+    `target_bytes` switches JPEG/WebP slices to a per-slice byte budget (see
+    `encode_to_budget`); the size change against `saveQuality` is printed and
+    added to `job_stats` (a dict), if given. With watermarking on, the job's
+    `WatermarkPlacementCache` hits/misses are reported the same way.
+    `watermark_search` is the watermark position search: 'exhaustive'
+    (default) or 'pyramid' (see `find_best_watermark_position`).
+    `placement_cache=False` bypasses the `WatermarkPlacementCache`.
     """
+    def slice_filename(index):
+        return format_filename(filename_pattern, index, filename_digits, saveFormat, folder_name=os.path.basename(save_path), total=len(cut_points) - 1)
+
     def process_slice(start, end, image_file, index, save_path):
-        """Crop and save a single slice segment to disk with format encoding."""
+        """Crop and save a single slice segment (to disk, or into the archive/PDF) with format encoding."""
         width, _ = image_file.size
         res = image_file.crop((0, start, width, end))
-        is_psd = saveFormat.lower() == "psd"
-        # For PSD output the watermark goes in as a separate layer (inside
-        # save_psd_layered) instead of being baked into the pixels, so the
-        # user can reposition it later in Photoshop.
-        if watermark_enabled and not is_psd:
-            res = apply_watermark(res, watermark_path, watermark_count, watermark_edge, watermark_width_percent, margin=watermark_margin)
-        filename = format_filename(filename_pattern, index, filename_digits, saveFormat, folder_name=os.path.basename(save_path), total=len(cut_points) - 1)
-        filepath = os.path.join(save_path, filename)
-        if saveFormat.lower() == "webp":
-            res.save(filepath, format="webp", quality=saveQuality, method=6)
-        elif is_psd:
-            save_psd_layered(res, filepath, watermark_enabled, watermark_path, watermark_count, watermark_edge, watermark_width_percent, watermark_margin=watermark_margin)
+        planned = planned_watermarks.get(index)
+        if bundle is not None:
+            buffer = io.BytesIO()
+            tally.add(_export_slice(res, buffer, saveFormat, saveQuality, watermark_opts, planned, encoder_profile, target_bytes))
+            bundle.put(slice_filename(index), buffer.getvalue())
         else:
-            res.save(filepath, quality=saveQuality, optimize=True, progressive=True)
-        res.close()
+            tally.add(_export_slice(res, os.path.join(save_path, slice_filename(index)), saveFormat, saveQuality, watermark_opts, planned, encoder_profile, target_bytes))
 
     image_file = image
     base_folder = output_base
@@ -672,11 +2069,18 @@ def slicer(image, saveFormat, slicesCount, saveQuality, mode, current_date, save
     while os.path.exists(save_path) or os.path.exists(f"{save_path}.zip") or os.path.exists(f"{save_path}.cbz"):
         counter += 1
         save_path = f"{original_save_path} ({counter})"
-    os.makedirs(save_path, exist_ok=True)
+    # ZIP/CBZ/PDF output streams slices straight into that one file; only
+    # plain output goes through the folder.
+    bundle_path = None
+    if isZip:
+        bundle_path = _archive_path(save_path, mode, output_base, current_date, "zip")
+    elif isCbz:
+        bundle_path = _archive_path(save_path, mode, output_base, current_date, "cbz")
+    elif isPdf:
+        bundle_path = _archive_path(save_path, mode, output_base, current_date, "pdf")
+    else:
+        os.makedirs(save_path, exist_ok=True)
     
-    cut_points = find_safe_cut_points(image_file, slicesCount)
-    cut_points = [0] + cut_points
-
     # Calculate target maximum slice height limit (from requested slicesCount and format bounds)
     target_max_h = int(image_file.height / float(slicesCount)) if (slicesCount and slicesCount > 0) else image_file.height
     if target_max_h <= 0:
@@ -689,6 +2093,17 @@ def slicer(image, saveFormat, slicesCount, saveQuality, mode, current_date, save
     else:
         target_max_h = min(target_max_h, 65500)
 
+    # With watermarking on, one shared analysis of the composite feeds both
+    # cut detection and every slice's watermark search. Strip sources stay
+    # on the per-slice path so their memory stays bounded.
+    in_memory = isinstance(image_file, (Image.Image, SharedMemoryCanvas))
+    analysis = ChapterAnalysis(image_file) if (watermark_enabled and in_memory) else None
+    track_placements = watermark_enabled and placement_cache
+    placement_counts = get_placement_cache().counts() if track_placements else None
+
+    cut_points = find_safe_cut_points(image_file, slicesCount, planner=cut_planner, max_height=target_max_h, analysis=analysis)
+    cut_points = [0] + cut_points
+
     # Cap all slice gaps so no single slice exceeds target_max_h or image format limit
     cut_points = _cap_slice_gaps(cut_points, target_max_h)
 
@@ -715,89 +2130,76 @@ def slicer(image, saveFormat, slicesCount, saveQuality, mode, current_date, save
         # else: intermediate tiny gap is dropped (previous slice extends)
     cut_points = filtered_cuts
 
+    # Watermark placements for all slices come from the shared analysis in
+    # one pass over the composite; the analysis is released before encoding.
+    # Without an analysis (strip sources) each slice runs its own search.
+    planned_watermarks = {}
+    if analysis is not None:
+        planned_watermarks = plan_slice_watermarks(
+            analysis, cut_points, watermark_path, watermark_count, watermark_edge,
+            watermark_width_percent, margin=watermark_margin, max_workers=max_workers,
+            search_mode=watermark_search, placement_cache=placement_cache
+        )
+        analysis.close()
+
+    watermark_opts = None
+    if watermark_enabled:
+        watermark_opts = (watermark_path, watermark_count, watermark_edge, watermark_width_percent, watermark_margin, watermark_search, placement_cache)
+
+    slice_names = [slice_filename(i) for i in range(1, len(cut_points))]
+    tally = _ByteBudgetTally()
+    bundle = None
+    if isPdf and not (isZip or isCbz):
+        bundle = StreamingPdfWriter(bundle_path, slice_names)
+    elif bundle_path:
+        bundle = OrderedArchiveWriter(bundle_path, slice_names, saveFormat)
+
     # --- Slicing Logic with Progress ---
-    futures = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for i in range(1, len(cut_points)):
-            start, end = cut_points[i - 1], cut_points[i]
-            futures.append(executor.submit(process_slice, start, end, image_file, i, save_path))
-        
-        # Track progress
-        completed_count = 0
-        total_count = len(futures)
-        
-        for future in as_completed(futures):
-            future.result() # Wait for completion
-            completed_count += 1
-            if progress_callback:
-                percent = (completed_count / total_count) * 100
-                progress_callback(percent)
+    try:
+        # The process backend needs the composite's pixels in one shareable
+        # block; a VirtualStrip decodes lazily, so it stays on threads.
+        if encode_backend == 'process' and isinstance(image_file, (Image.Image, MemmapCanvas)):
+            slices = [
+                (cut_points[i - 1], cut_points[i], None if bundle else os.path.join(save_path, slice_names[i - 1]), planned_watermarks.get(i))
+                for i in range(1, len(cut_points))
+            ]
+            _export_slices_with_process_pool(
+                image_file, slices, saveFormat, saveQuality, watermark_opts, max_workers, progress_callback,
+                encoder_profile=encoder_profile,
+                on_encoded=(lambda position, data: bundle.put(slice_names[position], data)) if bundle else None,
+                target_bytes=target_bytes, tally=tally
+            )
+        else:
+            futures = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i in range(1, len(cut_points)):
+                    start, end = cut_points[i - 1], cut_points[i]
+                    futures.append(executor.submit(process_slice, start, end, image_file, i, save_path))
+
+                # Track progress
+                completed_count = 0
+                total_count = len(futures)
+
+                for future in as_completed(futures):
+                    future.result() # Wait for completion
+                    completed_count += 1
+                    if progress_callback:
+                        percent = (completed_count / total_count) * 100
+                        progress_callback(percent)
+    finally:
+        if bundle is not None:
+            bundle.close()
     # -----------------------------------
-    
-    if isZip:
-        zipFilePath = ""
-        folderName = os.path.basename(save_path)
-        if mode == 'single':
-            zipFilePath = os.path.join(os.path.dirname(save_path), f"{folderName}.zip")
-        elif mode == 'multi':
-            zipFilePath = os.path.join(output_base, current_date, f"{folderName}.zip")
-
-        with zipfile.ZipFile(zipFilePath, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in sorted(os.listdir(save_path), key=sort_key_improved):
-                file_path = os.path.join(save_path, file)
-                if os.path.isfile(file_path):
-                    zip_file.write(file_path, arcname=file)
-        shutil.rmtree(save_path)
-        
-    elif isCbz:
-        cbzFilePath = ""
-        folderName = os.path.basename(save_path)
-        if mode == 'single':
-            cbzFilePath = os.path.join(os.path.dirname(save_path), f"{folderName}.cbz")
-        elif mode == 'multi':
-            cbzFilePath = os.path.join(output_base, current_date, f"{folderName}.cbz")
-
-        with zipfile.ZipFile(cbzFilePath, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in sorted(os.listdir(save_path), key=sort_key_improved):
-                file_path = os.path.join(save_path, file)
-                if os.path.isfile(file_path):
-                    zip_file.write(file_path, arcname=file)
-        shutil.rmtree(save_path)
-        
-    elif isPdf:
-        pdfFilePath = ""
-        folderName = os.path.basename(save_path)
-        if mode == 'single':
-            pdfFilePath = os.path.join(os.path.dirname(save_path), f"{folderName}.pdf")
-        elif mode == 'multi':
-            # Ensure target directory exists
-            results_dir = os.path.join(output_base, current_date)
-            os.makedirs(results_dir, exist_ok=True)
-            pdfFilePath = os.path.join(results_dir, f"{folderName}.pdf")
-
-        # Collect image files for PDF generation with natural sorting
-        image_files = sorted(
-            [os.path.join(save_path, f) for f in os.listdir(save_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))],
-            key=sort_key_improved
-        )
-        
-        if image_files:
-            try:
-                # Convert image files into PDF
-                with open(pdfFilePath, "wb") as f:
-                    f.write(img2pdf.convert(image_files))
-                
-                print(f"PDF successfully created at: {pdfFilePath}")
-                
-                # Delete uncompressed directory after successful PDF creation
-                shutil.rmtree(save_path)
+    tally.report(saveQuality, job_stats)
+    if track_placements:
+        get_placement_cache().report(placement_counts, job_stats)
 
-            except Exception as e:
-                print(f"Failed to create PDF or delete folder for '{save_path}': {e}")
+    if isinstance(bundle, StreamingPdfWriter):
+        if bundle.written:
+            print(f"PDF successfully created at: {bundle_path}")
         else:
-            # Remove empty directory if no images were found
-            print(f"No images found in '{save_path}', removing the empty directory.")
-            os.rmdir(save_path)
+            print(f"No slices were written for '{save_path}', removing the empty PDF.")
+            os.remove(bundle_path)
 
 
 # Global list of temporary extraction directories
@@ -869,12 +2271,26 @@ def getAllImagesDirectory(imagesPath):
     return sorted([str(p) for p in imagesLocations], key=sort_key_improved)
 
 
-def process_batch_no_stitch(images, save_path, newWidth, isChecked, saveFormat, SaveQuality, is_zip, isPdf, isCbz, current_date, mode, progress_callback=None, output_base="./Results", max_workers=4, filename_pattern="[number]", filename_digits=3, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0):
+def process_batch_no_stitch(images, save_path, newWidth, isChecked, saveFormat, SaveQuality, is_zip, isPdf, isCbz, current_date, mode, progress_callback=None, output_base="./Results", max_workers=4, filename_pattern="[number]", filename_digits=3, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0, encoder_profile=DEFAULT_ENCODER_PROFILE, target_bytes=None, job_stats=None, watermark_search='exhaustive', placement_cache=True):
     """
     Processes images individually without stitching.
     Handles optional resizing, watermarking, saving, and ZIP/PDF/CBZ archiving.
+    `encoder_profile` names an `ENCODER_PROFILES` entry; `target_bytes`,
+    `job_stats`, `watermark_search` and `placement_cache` work as in `slicer`.
+    ZIP/CBZ/PDF output is streamed straight into that file (no temporary folder).
     """
-    os.makedirs(save_path, exist_ok=True)
+    bundle_path = None
+    if is_zip:
+        bundle_path = _archive_path(save_path, mode, output_base, current_date, "zip")
+    elif isPdf:
+        bundle_path = _archive_path(save_path, mode, output_base, current_date, "pdf")
+    elif isCbz:
+        bundle_path = _archive_path(save_path, mode, output_base, current_date, "cbz")
+    else:
+        os.makedirs(save_path, exist_ok=True)
+
+    def output_filename(idx):
+        return format_filename(filename_pattern, idx + 1, filename_digits, saveFormat, folder_name=os.path.basename(save_path), total=len(images))
 
     def _flatten_to_rgb(img):
         """Flatten transparency onto white, returning an RGB image.
@@ -892,23 +2308,35 @@ def process_batch_no_stitch(images, save_path, newWidth, isChecked, saveFormat,
     def worker_save_single(args):
         """Process and save a single image in no-stitch mode (resizing, watermarking, format conversion)."""
         img_path, idx = args
+        filename = output_filename(idx)
         try:
-            img = open_image_robust(img_path)
+            # Resize only if custom width is enabled. The target size comes
+            # from the header so the decoder can shrink on load.
+            src_w, src_h = get_image_size_fast(img_path) if isChecked else (0, 0)
+            if src_w > 0 and src_h > 0:
+                w_percent = (newWidth / float(src_w))
+                h_size = max(1, int(round(float(src_h) * float(w_percent))))
+                img = open_image_for_size(img_path, newWidth, h_size)
+            else:
+                img = open_image_robust(img_path)
             if not img:
+                if bundle is not None:
+                    bundle.skip(filename)
                 return None
 
-            # Resize only if custom width is enabled
             if isChecked:
-                w_percent = (newWidth / float(img.size[0]))
-                h_size = max(1, int(round(float(img.size[1]) * float(w_percent))))
-                img = img.resize((newWidth, h_size), Image.Resampling.BICUBIC)
+                if src_w <= 0 or src_h <= 0:
+                    w_percent = (newWidth / float(img.size[0]))
+                    h_size = max(1, int(round(float(img.size[1]) * float(w_percent))))
+                if img.size != (newWidth, h_size):
+                    img = img.resize((newWidth, h_size), Image.Resampling.BICUBIC)
 
             is_psd = saveFormat.lower() == "psd"
             # For PSD output the watermark goes in as a separate layer (inside
             # save_psd_layered) instead of being baked into the pixels, so the
             # user can reposition it later in Photoshop.
             if watermark_enabled and not is_psd:
-                img = apply_watermark(img, watermark_path, watermark_count, watermark_edge, watermark_width_percent, margin=watermark_margin)
+                img = apply_watermark(img, watermark_path, watermark_count, watermark_edge, watermark_width_percent, margin=watermark_margin, search_mode=watermark_search, placement_cache=placement_cache)
 
             # JPEG cannot store alpha — flatten RGBA/LA/transparent-palette
             # inputs onto white so they save instead of failing per-file.
@@ -919,94 +2347,70 @@ def process_batch_no_stitch(images, save_path, newWidth, isChecked, saveFormat,
                 if img.mode == 'CMYK':
                     img = img.convert('RGB')
 
-            filename = format_filename(filename_pattern, idx + 1, filename_digits, saveFormat, folder_name=os.path.basename(save_path), total=len(images))
-            filepath = os.path.join(save_path, filename)
+            target = io.BytesIO() if bundle is not None else os.path.join(save_path, filename)
 
-            if saveFormat.lower() == "webp":
-                img.save(filepath, format="webp", quality=SaveQuality, method=6)
-            elif is_psd:
-                save_psd_layered(img, filepath, watermark_enabled, watermark_path, watermark_count, watermark_edge, watermark_width_percent, watermark_margin=watermark_margin)
+            if is_psd:
+                save_psd_layered(img, target, watermark_enabled, watermark_path, watermark_count, watermark_edge, watermark_width_percent, watermark_margin=watermark_margin, zlib_level=_encoder_params('psd', encoder_profile)['zlib_level'], search_mode=watermark_search, placement_cache=placement_cache)
+            elif target_bytes and saveFormat.lower() in BYTE_BUDGET_FORMATS:
+                data, _, reference_size = encode_to_budget(img, saveFormat, target_bytes, SaveQuality, encoder_profile)
+                _write_bytes(target, data)
+                tally.add((len(data), reference_size))
             else:
-                img.save(filepath, quality=SaveQuality, optimize=True, progressive=True)
+                save_encoded(img, target, saveFormat, SaveQuality, encoder_profile)
             
             img.close()
+            if bundle is not None:
+                bundle.put(filename, target.getvalue())
             return True
-        except Exception as e:
-            print(f"Error in no-stitch mode for {img_path}: {e}")
-            return False
-
-    # Parallel processing
-    tasks = [(path, i) for i, path in enumerate(images)]
-    completed_count = 0
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(worker_save_single, t) for t in tasks]
-        for future in as_completed(futures):
-            future.result()
-            completed_count += 1
-            if progress_callback:
-                percent = (completed_count / len(images)) * 100
-                progress_callback(percent)
-
-    # Handle archive and PDF outputs
-    folderNameBase = os.path.basename(save_path)
-    
-    if is_zip:
-        zipFilePath = ""
-        if mode == 'single':
-            zipFilePath = os.path.join(os.path.dirname(save_path), f"{folderNameBase}.zip")
-        elif mode == 'multi':
-            zipFilePath = os.path.join(output_base, current_date, f"{folderNameBase}.zip")
-
-        with zipfile.ZipFile(zipFilePath, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in sorted(os.listdir(save_path), key=sort_key_improved):
-                file_path = os.path.join(save_path, file)
-                if os.path.isfile(file_path):
-                    zip_file.write(file_path, arcname=file)
-        shutil.rmtree(save_path)
-
-    elif isPdf:
-        pdfFilePath = ""
-        if mode == 'single':
-            pdfFilePath = os.path.join(os.path.dirname(save_path), f"{folderNameBase}.pdf")
-        elif mode == 'multi':
-            pdfFilePath = os.path.join(output_base, current_date, f"{folderNameBase}.pdf")
-
-        output_images = sorted(
-            [os.path.join(save_path, f) for f in os.listdir(save_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))],
-            key=sort_key_improved
-        )
-        
-        if output_images:
-            try:
-                with open(pdfFilePath, "wb") as f:
-                    f.write(img2pdf.convert(output_images))
-            except Exception:
-                img1 = Image.open(output_images[0]).convert("RGB")
-                other_images = [Image.open(f).convert("RGB") for f in output_images[1:]]
-                img1.save(pdfFilePath, "PDF", resolution=100.0, save_all=True, append_images=other_images)
-                img1.close()
-                for img in other_images: img.close()
-        
-        shutil.rmtree(save_path)
+        except Exception as e:
+            print(f"Error in no-stitch mode for {img_path}: {e}")
+            if bundle is not None:
+                bundle.skip(filename)
+            return False
 
-    elif isCbz:
-        cbzFilePath = ""
-        if mode == 'single':
-            cbzFilePath = os.path.join(os.path.dirname(save_path), f"{folderNameBase}.cbz")
-        elif mode == 'multi':
-            cbzFilePath = os.path.join(output_base, current_date, f"{folderNameBase}.cbz")
-
-        with zipfile.ZipFile(cbzFilePath, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in sorted(os.listdir(save_path), key=sort_key_improved):
-                file_path = os.path.join(save_path, file)
-                if os.path.isfile(file_path):
-                    zip_file.write(file_path, arcname=file)
-        shutil.rmtree(save_path)
+    # Parallel processing
+    tasks = [(path, i) for i, path in enumerate(images)]
+    completed_count = 0
+    output_names = [output_filename(i) for i in range(len(images))]
+    tally = _ByteBudgetTally()
+    track_placements = watermark_enabled and placement_cache
+    placement_counts = get_placement_cache().counts() if track_placements else None
+    bundle = None
+    if isPdf and not is_zip:
+        bundle = StreamingPdfWriter(bundle_path, output_names)
+    elif bundle_path:
+        bundle = OrderedArchiveWriter(bundle_path, output_names, saveFormat)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(worker_save_single, t) for t in tasks]
+            for future in as_completed(futures):
+                future.result()
+                completed_count += 1
+                if progress_callback:
+                    percent = (completed_count / len(images)) * 100
+                    progress_callback(percent)
+    finally:
+        if bundle is not None:
+            bundle.close()
+    tally.report(SaveQuality, job_stats)
+    if track_placements:
+        get_placement_cache().report(placement_counts, job_stats)
+
+    # An empty PDF is not a valid document; leave nothing behind instead.
+    if isinstance(bundle, StreamingPdfWriter) and not bundle.written:
+        os.remove(bundle_path)
 
     return True
 
 
+def _leading_true(flags):
+    """Length of the leading run of True values in a 1-D boolean array."""
+    if flags.all():
+        return flags.size
+    return int(np.argmin(flags))
+
+
 class ContentAwarePanelDetector:
     """
     Content-Aware Panel Detection with Speech Bubble Avoidance.
@@ -1028,6 +2432,11 @@ class ContentAwarePanelDetector:
     # Bubble-mask parameters
     BUBBLE_MASK_SCALE = 4     # Downscale factor for the whole-image bubble mask
     MASK_CLEARANCE = 8        # Extra pixels above/below the footprint checked against the mask
+
+    # Pyramid search (search_mode='pyramid')
+    PYRAMID_FACTOR = 4        # Proxy downscale; equal to BUBBLE_MASK_SCALE so the mask is reused as-is
+    PYRAMID_TOP_K = 4         # Proxy-ranked candidates re-scored at full resolution
+    PYRAMID_MIN_SEGMENT = 1200  # Shorter segments search exhaustively (the proxy does not pay for itself)
     
     @staticmethod
     def to_grayscale(img_array):
@@ -1086,12 +2495,17 @@ class ContentAwarePanelDetector:
         if h < 8 or w < 8:
             return np.zeros((max(h, 1), max(w, 1)), dtype=bool)
 
-        blocks = gray[:hh, :ww].reshape(h, scale, w, scale)
-        g_mean = blocks.mean(axis=(1, 3))
-        g_min = blocks.min(axis=(1, 3))
+        # Block statistics reduce rows first, then columns: two cheap
+        # contiguous reductions instead of one over a (h, s, w, s) view.
+        # uint16 partial sums are exact (at most 255 * scale per column).
+        n_block = scale * scale
+        g_rows = gray[:hh, :ww].reshape(h, scale, ww)
+        g_mean = g_rows.sum(axis=1, dtype=np.uint16).reshape(h, w, scale).sum(axis=2) / n_block
+        g_min = g_rows.min(axis=1).reshape(h, w, scale).min(axis=2)
 
         if saturation is not None:
-            s_mean = saturation[:hh, :ww].reshape(h, scale, w, scale).mean(axis=(1, 3))
+            s_rows = saturation[:hh, :ww].reshape(h, scale, ww)
+            s_mean = s_rows.sum(axis=1, dtype=np.uint16).reshape(h, w, scale).sum(axis=2) / n_block
         else:
             s_mean = np.zeros((h, w), dtype=np.float32)
 
@@ -1130,25 +2544,10 @@ class ContentAwarePanelDetector:
 
         # --- Grow seeds through the connected white area (bubble + tail) ---
         # Constrained radius (~64px max) so it stays inside the bubble and doesn't leak into skies.
-        mask = np.ascontiguousarray(seeds)
-        white_flat = np.ascontiguousarray(white).ravel()
-        mask_flat = mask.ravel()
-        frontier = np.flatnonzero(mask_flat)
+        # The cap also bounds quality: parts of a bubble (or a long tail) more
+        # than this geodesic distance from its text are left out of the mask.
         max_iters = max(10, min(16, 64 // scale))
-        for _ in range(max_iters):
-            if frontier.size == 0:
-                break
-            up = frontier[frontier >= w] - w
-            down = frontier[frontier < (h - 1) * w] + w
-            left = frontier[frontier % w != 0] - 1
-            right = frontier[frontier % w != w - 1] + 1
-            cand = np.concatenate((up, down, left, right))
-            cand = cand[white_flat[cand] & ~mask_flat[cand]]
-            if cand.size == 0:
-                break
-            cand = np.unique(cand)
-            mask_flat[cand] = True
-            frontier = cand
+        mask = ContentAwarePanelDetector.grow_within(seeds, white, max_iters)
 
         # Safety valve: if the mask swallowed most of the image the seeding
         # misfired (e.g. an all-text credits page) — better to fall back to
@@ -1158,6 +2557,39 @@ class ContentAwarePanelDetector:
 
         return mask
 
+    @staticmethod
+    def grow_within(seeds, allowed, max_steps):
+        """
+        Geodesic dilation: every `allowed` cell reachable from `seeds` in at
+        most `max_steps` 4-connected steps through `allowed` cells.
+
+        Each step ORs the mask with its four one-cell shifts and clips it to
+        `allowed`, on bit-packed rows (8 cells per byte), so a step is a few
+        whole-grid operations over h * w / 8 bytes. Stops early once a step
+        adds nothing. This is the same capped growth as the per-step boolean
+        dilation it replaced, not a connected-component labelling: cells
+        beyond `max_steps` stay out of the mask even when connected.
+        """
+        h, w = seeds.shape
+        grown = np.packbits(seeds, axis=1)
+        barrier = np.packbits(allowed, axis=1)
+        for _ in range(max_steps):
+            step = grown.copy()
+            step[1:] |= grown[:-1]               # down
+            step[:-1] |= grown[1:]               # up
+            # packbits is big-endian: column j is bit (7 - j % 8) of byte j // 8,
+            # so >> 1 moves cells right and << 1 left; the edge bit carries
+            # into the neighbouring byte.
+            step |= grown >> 1
+            step[:, 1:] |= grown[:, :-1] << 7
+            step |= grown << 1
+            step[:, :-1] |= grown[:, 1:] >> 7
+            step &= barrier                      # padding bits are never allowed
+            if np.array_equal(step, grown):
+                break
+            grown = step
+        return np.unpackbits(grown, axis=1, count=w).astype(bool)
+
     @staticmethod
     def detect_text_pattern(gray_region):
         """
@@ -1188,6 +2620,19 @@ class ContentAwarePanelDetector:
         text_confidence = min(1.0, dark_ratio * 10) if has_text else 0
         
         return has_text, text_confidence
+
+    @staticmethod
+    def text_pattern_from_counts(n, white, dark, medium):
+        """
+        `detect_text_pattern`'s has_text from pixel counts of a region of
+        `n` pixels: very white (> 235), dark (10..80) and medium-dark (80..150).
+        Works on scalars and numpy arrays alike.
+        """
+        very_white = white / n
+        dark_ratio = dark / n
+        medium_ratio = medium / n
+        has_text = ((dark_ratio > 0.02) & (dark_ratio < 0.25)) | ((dark_ratio > 0.01) & (medium_ratio > 0.05))
+        return (very_white >= 0.15) & has_text
     
     @staticmethod
     def detect_face_region(gray_region, sat_region):
@@ -1229,79 +2674,113 @@ class ContentAwarePanelDetector:
         Full-width white bands (gutters, white page background) are exempted
         so the watermark can still sit tight against a panel edge.
 
+        The trim bounds and all nine cells' statistics come from whole-window
+        masks reduced per band/cell in one pass, instead of per-row `np.mean`
+        calls and per-cell copies.
+
         Returns (overlap, overlap_cells) where overlap_cells is a list of
         (row, col) grid coordinates of the offending cells.
         """
+        D = ContentAwarePanelDetector
         grid_rows, grid_cols = 3, 3
-        y0 = max(0, y - clearance)
+        win_y0 = y0 = max(0, y - clearance)
         y1 = min(img_height, y_end + clearance)
-        
-        while y0 < y and np.mean(gray[y0, x_start_wm:x_end_wm] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD) > 0.85:
-            y0 += 1
-        while y1 > y_end and np.mean(gray[y1 - 1, x_start_wm:x_end_wm] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD) > 0.85:
-            y1 -= 1
-            
+
+        # One whiteness mask over the whole window serves the row trim and
+        # every cell; trim bounds come from its per-row counts.
+        window_bright = gray[y0:y1, x_start_wm:x_end_wm] > D.BUBBLE_WHITE_THRESHOLD
+        row_white = np.count_nonzero(window_bright, axis=1) / max(x_end_wm - x_start_wm, 1) > 0.85
+        y0 += _leading_true(row_white[:y - y0])
+        y1 -= _leading_true(row_white[y_end - win_y0:][::-1])
+
         # Full-height column whiteness over the watermark's x-range.
         if col_white is None:
-            col_white = np.mean(gray[:, x_start_wm:x_end_wm] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD, axis=0)
-        x_start = x_start_wm
-        while x_start < x_end_wm - 3 and col_white[x_start - x_start_wm] > 0.9:
-            x_start += 1
-            
-        x_end = x_end_wm
-        while x_end > x_start + 3 and col_white[x_end - 1 - x_start_wm] > 0.9:
-            x_end -= 1
+            col_white = np.mean(gray[:, x_start_wm:x_end_wm] > D.BUBBLE_WHITE_THRESHOLD, axis=0)
+        x_start = x_start_wm + _leading_true(col_white[:max(0, x_end_wm - 3 - x_start_wm)] > 0.9)
+        x_end = x_end_wm - _leading_true(col_white[max(0, x_start + 3 - x_start_wm):x_end_wm - x_start_wm][::-1] > 0.9)
 
         region = gray[y0:y1, x_start:x_end]
-        sat_region = saturation[y0:y1, x_start:x_end] if saturation is not None else None
         h, w = region.shape[:2]
-        
+
         if h < grid_rows or w < grid_cols:
             return False, []
-            
-        row_edges = np.linspace(0, h, grid_rows + 1).astype(int)
-        col_edges = np.linspace(0, w, grid_cols + 1).astype(int)
+
+        # Same bounds as np.linspace(0, n, 4).astype(int)
+        row_edges = [i * h // grid_rows for i in range(grid_rows + 1)]
+        col_edges = [i * w // grid_cols for i in range(grid_cols + 1)]
+        bright = window_bright[y0 - win_y0:y1 - win_y0, x_start - x_start_wm:x_end - x_start_wm]
+
+        # Cell sums of a stack of per-pixel maps are row/column indicator
+        # products: rows @ maps @ cols -> (maps, grid_rows, grid_cols).
+        # float32 sums of integers stay exact below 2**24 (a saturation sum
+        # is at most 255 per pixel).
+        dtype = np.float32 if h * w * 255 < 2 ** 24 else np.float64
+        rows = np.zeros((grid_rows, h), dtype=dtype)
+        cols = np.zeros((w, grid_cols), dtype=dtype)
+        for i in range(grid_rows):
+            rows[i, row_edges[i]:row_edges[i + 1]] = 1
+        for i in range(grid_cols):
+            cols[col_edges[i]:col_edges[i + 1], i] = 1
+
+        # Bright counts first: most footprints over artwork have no cell
+        # bright enough to inspect, and need nothing else.
+        bright_count = (rows @ bright @ cols).astype(np.int64)
+        sizes = np.array([[(row_edges[r + 1] - row_edges[r]) * (col_edges[c + 1] - col_edges[c])
+                           for c in range(grid_cols)] for r in range(grid_rows)])
+        inspect = (sizes >= 25) & (bright_count / sizes >= 0.05)
+        if not inspect.any():
+            return False, []
+
+        # The remaining maps only over the bands that hold such cells.
+        # Edge pairs (> 40) count only inside one band/cell: pairs crossing
+        # a band or cell boundary are dropped.
+        bands = np.flatnonzero(inspect.any(axis=1))
+        top, bottom = row_edges[bands[0]], row_edges[bands[-1] + 1]
+        sub = region[top:bottom]
+        maps = np.empty((5, bottom - top, w), dtype=dtype)
+        maps[0] = (sub < 80) & (sub > 10)
+        maps[1] = (sub >= 80) & (sub < 150)
+        s16 = sub.astype(np.int16)
+        maps[2, :-1] = np.abs(np.diff(s16, axis=0)) > 40
+        maps[2, [e - 1 - top for e in row_edges[1:] if top < e <= bottom]] = 0
+        maps[3, :, :-1] = np.abs(np.diff(s16, axis=1)) > 40
+        maps[3, :, [e - 1 for e in col_edges[1:]]] = 0
+        if saturation is not None:
+            np.multiply(bright[top:bottom], saturation[y0 + top:y0 + bottom, x_start:x_end], out=maps[4])
+        else:
+            maps[4] = 0
+        dark_count, medium_count, edge_y_count, edge_x_count, bright_sat = (rows[:, top:bottom] @ maps @ cols).astype(np.int64)
+
         overlap_cells = []
-        
         for r in range(grid_rows):
-            band = region[row_edges[r]:row_edges[r + 1], :]
-            band_white = np.count_nonzero(band > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD) / band.size if band.size else 0
-            if band_white >= ContentAwarePanelDetector.MIN_GUTTER_COVERAGE:
-                if band.shape[0] > 2 and band.shape[1] > 2:
-                    band_gy = np.abs(np.diff(band.astype(np.int16), axis=0))
-                    band_edges = np.count_nonzero(band_gy > 40) / band_gy.size
+            bh = row_edges[r + 1] - row_edges[r]
+            if bright_count[r].sum() / (bh * w) >= D.MIN_GUTTER_COVERAGE:
+                if bh > 2 and w > 2:
+                    band_edges = edge_y_count[r].sum() / ((bh - 1) * w)
                 else:
                     band_edges = 0
                 if band_edges < 0.01:
                     continue
-                
+
             for c in range(grid_cols):
-                cell = region[row_edges[r]:row_edges[r + 1], col_edges[c]:col_edges[c + 1]]
-                if cell.size < 25:
+                if not inspect[r, c]:
                     continue
-                    
-                bright_mask = cell > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD
-                very_white = np.count_nonzero(bright_mask) / bright_mask.size
-                if very_white < 0.05:
+                cw = col_edges[c + 1] - col_edges[c]
+                size = bh * cw
+                very_white = bright_count[r, c] / size
+
+                if saturation is not None and bright_sat[r, c] / bright_count[r, c] > 0.15 * 255:
                     continue
-                    
-                if sat_region is not None:
-                    sat_cell = sat_region[row_edges[r]:row_edges[r + 1], col_edges[c]:col_edges[c + 1]]
-                    if sat_cell.size > 0 and np.mean(sat_cell[bright_mask]) > 0.15 * 255:
-                        continue
-                        
-                has_text, _ = ContentAwarePanelDetector.detect_text_pattern(cell)
-                if cell.shape[0] > 2 and cell.shape[1] > 2:
-                    c16 = cell.astype(np.int16)
-                    gy = np.abs(np.diff(c16, axis=0))
-                    gx = np.abs(np.diff(c16, axis=1))
-                    edge_density = (np.count_nonzero(gy > 40) / gy.size + np.count_nonzero(gx > 40) / gx.size) / 2
+
+                has_text = D.text_pattern_from_counts(size, bright_count[r, c], dark_count[r, c], medium_count[r, c])
+                if bh > 2 and cw > 2:
+                    edge_density = (edge_y_count[r, c] / ((bh - 1) * cw) + edge_x_count[r, c] / (bh * (cw - 1))) / 2
                 else:
                     edge_density = 0
-                    
+
                 if has_text or edge_density > 0.015 or very_white > 0.75:
                     overlap_cells.append((r, c))
-                    
+
         return len(overlap_cells) > 0, overlap_cells
 
     @staticmethod
@@ -1552,6 +3031,12 @@ class ContentAwarePanelDetector:
         one Python call per row, then gutter runs are extracted from the
         row-type array.
         """
+        types = ContentAwarePanelDetector.classify_gutter_rows(gray, saturation)
+        return ContentAwarePanelDetector.gutters_from_row_types(types)
+
+    @staticmethod
+    def classify_gutter_rows(gray, saturation):
+        """Per-row gutter type: 0 = content, 1 = white, 2 = black, 3 = uniform-color gutter."""
         height = gray.shape[0]
 
         white_r = np.mean(gray > ContentAwarePanelDetector.WHITE_THRESHOLD, axis=1)
@@ -1570,6 +3055,14 @@ class ContentAwarePanelDetector:
         types[~white_cov & (black_r >= cov)] = 2
         # Detect solid uniform colored gutters (dark gray, navy, cream, etc.)
         types[(types == 0) & (row_vars < 25)] = 3
+        return types
+
+    @staticmethod
+    def gutters_from_row_types(types):
+        """Extract gutter runs (at least MIN_GUTTER_HEIGHT rows of one gutter type) from a row-type array."""
+        height = types.shape[0]
+        if height == 0:
+            return []
 
         # Split into runs of identical type
         change = np.flatnonzero(np.diff(types)) + 1
@@ -1590,12 +3083,26 @@ class ContentAwarePanelDetector:
 
         return gutters
     
+    @staticmethod
+    def panel_edges(gutters, img_height):
+        """
+        Panel boundaries for edge-affinity scoring: every gutter start/end
+        plus the physical image top/bottom. Used to pull watermarks toward
+        panel edges instead of letting them float mid-panel.
+        """
+        edges = [0, img_height]
+        for g in gutters:
+            edges.append(g['start'])
+            edges.append(g['end'])
+        return edges
+
     @staticmethod
     def find_adjusted_position(gray, saturation, initial_y, direction, wm_height, wm_width,
                                 img_height, range_start, range_end, margin, initial_score, initial_info, edge='left', x_margin=0,
-                                bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None):
+                                bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None, profile=None):
         """
         Find an adjusted position away from problematic content.
+        Positions are scored from `profile` (a `_ScoreProfile`) when given.
         """
         best_y = initial_y
         best_score = initial_score
@@ -1610,10 +3117,13 @@ class ContentAwarePanelDetector:
             if test_y < range_start + margin or test_y + wm_height > range_end - margin:
                 break
 
-            test_score, test_info = ContentAwarePanelDetector.analyze_region_detailed(
-                gray, saturation, test_y, wm_height, wm_width, img_height, edge, x_margin,
-                bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
-            )
+            if profile is not None:
+                test_score, test_info = profile.analyze(test_y)
+            else:
+                test_score, test_info = ContentAwarePanelDetector.analyze_region_detailed(
+                    gray, saturation, test_y, wm_height, wm_width, img_height, edge, x_margin,
+                    bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+                )
             
             if test_score > best_score:
                 best_y = test_y
@@ -1631,9 +3141,10 @@ class ContentAwarePanelDetector:
     
     @staticmethod
     def _fallback_scan(gray, saturation, range_start, range_end, wm_width, wm_height, margin, edge='left', x_margin=0,
-                       bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None):
+                       bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None, scorer=None):
         """
         Fallback: Scan the segment for best placement with preference for clean corners/edges.
+        `scorer` is a `_FallbackScanScorer` covering the scan rows, if one is already built.
         """
         scan_start = range_start + margin
         scan_end = range_end - wm_height - margin
@@ -1662,6 +3173,20 @@ class ContentAwarePanelDetector:
             return score, info
 
         coarse_step = min(40, max(10, wm_height // 3))
+
+        # Summed-area scoring: same placements as the per-candidate loop below.
+        if scorer is None:
+            scorer = _FallbackScanScorer(
+                gray, saturation, scan_start, scan_end, wm_height, wm_width, edge, x_margin,
+                bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+            )
+        if scorer.valid:
+            best_y, best_score = scorer.best(range(scan_start, scan_end, coarse_step), range_start, range_end, best_y, best_score)
+            fine_start = max(scan_start, best_y - coarse_step)
+            fine_end = min(scan_end, best_y + coarse_step)
+            best_y, best_score = scorer.best(range(fine_start, fine_end, 5), range_start, range_end, best_y, best_score)
+            return best_y, best_score, "fallback(scan)"
+
         for y in range(scan_start, scan_end, coarse_step):
             score, info = _eval_pos(y)
             if score > best_score:
@@ -1679,12 +3204,146 @@ class ContentAwarePanelDetector:
                 best_info = info
 
         return best_y, best_score, "fallback(scan)"
-    
+
+    @staticmethod
+    def pyramid_proxy(gray, saturation, x0=0, x1=None, factor=None):
+        """
+        Subsampled proxies of the column band [x0, x1) of `gray` and
+        `saturation`: the centre pixel of every `factor` x `factor` block,
+        with the band widened to whole blocks. Point samples keep the pixel
+        distribution the white/dark/text ratios are measured on, which block
+        means would blur. Returns `(gray_proxy, saturation_proxy, factor, band_x0)`.
+        """
+        f = factor or ContentAwarePanelDetector.PYRAMID_FACTOR
+        width = gray.shape[1]
+        x1 = width if x1 is None else x1
+        bx0 = x0 // f * f
+        bx1 = min(width // f * f, -(-x1 // f) * f)
+        h = gray.shape[0] // f * f
+
+        def shrink(a):
+            if a is None or h == 0 or bx1 <= bx0:
+                return None
+            return np.ascontiguousarray(a[f // 2:h:f, bx0 + f // 2:bx1:f])
+
+        return shrink(gray), shrink(saturation), f, bx0
+
+    @staticmethod
+    def _pyramid_search(gray, saturation, proxy, edges, range_start, range_end, wm_w, wm_h, margin, edge='left', x_margin=0,
+                        bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None):
+        """
+        Coarse-to-fine variant of the candidate search in `find_best_watermark_position`.
+
+        Every position the exhaustive search can visit — each gutter edge,
+        each adjustment step away from it and each fallback-scan row — is
+        scored at once on the `pyramid_proxy`, with the exact edge, drift and
+        segment-corner bonuses added. Only the PYRAMID_TOP_K best edge
+        candidates (and, if the best of those is unsafe, the best scan
+        candidates) are re-scored at full resolution with
+        `analyze_region_detailed`. Returns `(y, score, info_str)`, or None
+        when the proxy is unusable and the exhaustive search should run.
+        """
+        D = ContentAwarePanelDetector
+        gray_p, sat_p, f, band_x0 = proxy
+        if gray_p is None:
+            return None
+        img_height, img_width = gray.shape[:2]
+        x_start = x_margin if edge == 'left' else max(0, img_width - x_margin - wm_w)
+        lo, hi = range_start + margin, range_end - margin - wm_h
+
+        # (y, bonus, edge item or None, adjustment) per candidate
+        edge_cands = []
+        step, max_adj = D.ADJUSTMENT_STEP, D.MAX_ADJUSTMENT
+        for item in edges:
+            initial_y = item['y'] if item['type'] == 'panel_start' else item['y'] - wm_h
+            if initial_y < lo or initial_y > hi:
+                continue
+            white_bonus = 20 if item['gutter_type'] == 'white' else 0
+            edge_cands.append((initial_y, white_bonus + 20, item, 0))
+            for direction in (1, -1):
+                for offset in range(step, max_adj + step, step):
+                    test_y = initial_y + offset * direction
+                    if test_y < lo or test_y > hi:
+                        break
+                    drift = offset * 2.0 + (80 if offset > 40 else 0)
+                    edge_cands.append((test_y, white_bonus - drift, item, offset * direction))
+        scan_ys = np.arange(lo, hi, 5, dtype=np.int64)
+        scan_bonus = _FallbackScanScorer.segment_corner_bonus(scan_ys, wm_h, range_start, range_end, panel_edges)
+        scan_cands = [(int(y), float(b), None, 0) for y, b in zip(scan_ys, scan_bonus)]
+
+        candidates = edge_cands + scan_cands
+        if not candidates:
+            return None
+        ys_p = np.array([c[0] for c in candidates], dtype=np.int64)
+        ys_p = np.minimum((ys_p + f // 2) // f, gray_p.shape[0] - 1)
+        # The proxy covers only the watermark's column band; the mask lines up with it when it has the proxy's scale
+        mask_p = bubble_mask[:, band_x0 // f:] if bubble_mask is not None and mask_scale == f else None
+        scorer = _FallbackScanScorer(
+            gray_p, sat_p, int(ys_p.min()), int(ys_p.max()) + 1, max(1, (wm_h + f // 2) // f), max(1, wm_w // f),
+            'left', (x_start - band_x0) // f, bubble_mask=mask_p, mask_scale=1,
+            panel_edges=[(e + f // 2) // f for e in panel_edges] if panel_edges else None, scale=f
+        )
+        if not scorer.valid:
+            return None
+        head, terms, _ = scorer.partial_scores(ys_p)
+        approx = scorer.apply_terms(head, terms, slice(None)) + np.array([c[1] for c in candidates])
+
+        def refine(cands, scores):
+            # Ties go to the earliest candidate, as in the exhaustive search
+            best, best_index = None, None
+            for i in np.argsort(-scores, kind='stable')[:D.PYRAMID_TOP_K]:
+                y, bonus, item, adjustment = cands[i]
+                score, info = D.analyze_region_detailed(
+                    gray, saturation, y, wm_h, wm_w, img_height, edge, x_margin,
+                    bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+                )
+                score += bonus
+                if best is None or score > best[1] or (score == best[1] and i < best_index):
+                    best, best_index = (y, score, info, item, adjustment), i
+            return best
+
+        best = refine(edge_cands, approx[:len(edge_cands)]) if edge_cands else None
+        best_unsafe = (
+            best is None or
+            best[1] < D.MIN_SAFE_SCORE or
+            best[2].get('is_speech_bubble', False) or
+            best[2].get('bubble_overlap', False) or
+            best[2].get('is_face', False)
+        )
+        if best_unsafe:
+            if scan_cands:
+                scan_y, scan_score, _, _, _ = refine(scan_cands, approx[len(edge_cands):])
+                scan_info = "fallback(scan)"
+            else:
+                scan_y, scan_score, scan_info = D._fallback_scan(
+                    gray, saturation, range_start, range_end, wm_w, wm_h, margin, edge, x_margin
+                )
+            if best is None or scan_score > best[1]:
+                return scan_y, scan_score, scan_info
+
+        y, score, _, item, adjustment = best
+        adj_str = f"[{'↓' if adjustment > 0 else '↑'}{abs(adjustment)}px]" if adjustment else ""
+        return y, score, f"{item['type']}({item['gutter_type']}){adj_str}"
+
     @staticmethod
     def find_best_watermark_position(composite, img_width, img_height, wm_w, wm_h, range_start, range_end, edge='left', x_margin=0, gray=None, saturation=None,
-                                     bubble_mask=None, mask_scale=None, gutters=None):
+                                     bubble_mask=None, mask_scale=None, gutters=None, col_white=None, search_mode='exhaustive', proxy=None,
+                                     profile=None):
         """
         Find the best watermark position with content-aware adjustment inside a specific segment.
+        `col_white` is the full-height column whiteness of the watermark's
+        x-span; callers searching several segments of one image pass it in.
+
+        `search_mode='pyramid'` ranks the candidates on a downscaled proxy
+        and re-scores only the best few at full resolution (see
+        `_pyramid_search`); `proxy` is a precomputed `pyramid_proxy` of the
+        watermark's column band. Its fixed cost (the proxy and the
+        full-resolution re-scores) only pays off on tall segments, so
+        segments shorter than PYRAMID_MIN_SEGMENT rows are searched
+        exhaustively.
+        The default 'exhaustive' mode scores every candidate at full resolution,
+        reading the scores from `profile` (a `_ScoreProfile` of this image and
+        watermark x-range) when one is given.
         """
         if gray is None or saturation is None:
             if isinstance(composite, Image.Image):
@@ -1708,29 +3367,22 @@ class ContentAwarePanelDetector:
 
         # Full-height column whiteness for the (fixed) watermark x-range,
         # computed once here instead of inside every candidate evaluation.
-        if edge == 'left':
-            cw_x0 = x_margin
-            cw_x1 = min(x_margin + wm_w, img_width)
-        else:
-            cw_x0 = max(0, img_width - x_margin - wm_w)
-            cw_x1 = img_width - x_margin
-        if cw_x1 > cw_x0:
-            col_white = np.mean(gray[:, cw_x0:cw_x1] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD, axis=0)
-        else:
-            col_white = None
+        if col_white is None:
+            if edge == 'left':
+                cw_x0 = x_margin
+                cw_x1 = min(x_margin + wm_w, img_width)
+            else:
+                cw_x0 = max(0, img_width - x_margin - wm_w)
+                cw_x1 = img_width - x_margin
+            if cw_x1 > cw_x0:
+                col_white = np.mean(gray[:, cw_x0:cw_x1] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD, axis=0)
 
         # Find gutters (whole-image; callers placing several watermarks pass
         # a precomputed list so this is not repeated per segment)
         if gutters is None:
             gutters = ContentAwarePanelDetector.find_gutters(gray, saturation)
 
-        # Panel boundaries for edge-affinity scoring: every gutter start/end
-        # plus the physical image top/bottom. Used to pull watermarks toward
-        # panel edges instead of letting them float mid-panel.
-        panel_edges = [0, img_height]
-        for g in gutters:
-            panel_edges.append(g['start'])
-            panel_edges.append(g['end'])
+        panel_edges = ContentAwarePanelDetector.panel_edges(gutters, img_height)
         
         # Get panel edges from gutters
         edges = []
@@ -1761,6 +3413,24 @@ class ContentAwarePanelDetector:
                 x_end_wm = min(img_width, img_width - x_margin)
             col_white = np.mean(gray[:, x_start_wm:x_end_wm] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD, axis=0)
 
+        if edge == 'left':
+            x_pos = x_margin
+        else:
+            x_pos = img_width - x_margin - wm_w
+            if x_pos < 0:
+                x_pos = 0
+
+        if search_mode == 'pyramid' and seg_h >= ContentAwarePanelDetector.PYRAMID_MIN_SEGMENT:
+            if proxy is None:
+                proxy = ContentAwarePanelDetector.pyramid_proxy(gray, saturation, x_pos, x_pos + wm_w)
+            found = ContentAwarePanelDetector._pyramid_search(
+                gray, saturation, proxy, edges, range_start, range_end, wm_w, wm_h, margin, edge, x_margin,
+                bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+            )
+            if found is not None:
+                y, score, info_str = found
+                return x_pos, y, score, info_str
+
         candidates = []
         
         for edge_item in edges:
@@ -1775,10 +3445,13 @@ class ContentAwarePanelDetector:
             if initial_y < range_start + margin or initial_y + wm_h > range_end - margin:
                 continue
             
-            score, info = ContentAwarePanelDetector.analyze_region_detailed(
-                gray, saturation, initial_y, wm_h, wm_w, img_height, edge, x_margin,
-                bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
-            )
+            if profile is not None:
+                score, info = profile.analyze(initial_y)
+            else:
+                score, info = ContentAwarePanelDetector.analyze_region_detailed(
+                    gray, saturation, initial_y, wm_h, wm_w, img_height, edge, x_margin,
+                    bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+                )
             
             final_y = initial_y
             adjustment = 0
@@ -1804,7 +3477,8 @@ class ContentAwarePanelDetector:
                 adj_y, adj_score, adj_amount, adj_info = ContentAwarePanelDetector.find_adjusted_position(
                     gray, saturation, initial_y, direction, wm_h, wm_w,
                     img_height, range_start, range_end, margin, score, info, edge, x_margin,
-                    bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+                    bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white,
+                    profile=profile
                 )
                 
                 # Penalize drifting away from the panel edge into the artwork.
@@ -1844,14 +3518,7 @@ class ContentAwarePanelDetector:
                 'info': info,
                 'confidence': edge_item['confidence']
             })
-        
-        if edge == 'left':
-            x_pos = x_margin
-        else:
-            x_pos = img_width - x_margin - wm_w
-            if x_pos < 0:
-                x_pos = 0
-                
+
         candidates.sort(key=lambda x: x['score'], reverse=True)
         best = candidates[0] if candidates else None
 
@@ -1872,18 +3539,717 @@ class ContentAwarePanelDetector:
         if best_unsafe:
             scan_y, scan_score, scan_info = ContentAwarePanelDetector._fallback_scan(
                 gray, saturation, range_start, range_end, wm_w, wm_h, margin, edge, x_margin,
-                bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+                bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white,
+                scorer=profile.scorer if profile is not None else None
             )
             if best is None or scan_score > best['score']:
                 return x_pos, scan_y, scan_score, scan_info
 
         edge_info = f"{best['edge_type']}({best['gutter_type']}){best['adj_str']}"
         return x_pos, best['y'], best['score'], edge_info
-def compute_watermark_placements(img, watermark_path, count, edge, watermark_width_percent=12, margin=0):
+
+
+class _FallbackScanScorer:
+    """
+    Vectorized `analyze_region_detailed` for `_fallback_scan`.
+
+    The watermark's x-range is fixed for a whole scan, so every region
+    statistic the score uses (intensity and intensity² sums, saturation sum,
+    threshold counts, edge counts, bubble-mask coverage) is a difference of
+    row-prefix sums over that x-range. The tables are built once per scan
+    window; each candidate then costs O(1) and a whole candidate list is a
+    few array operations. The one term that is not a region statistic, the
+    `detect_bubble_overlap` cell grid, can only lower a score, so the scores
+    without it are upper bounds and the exact check runs only for candidates
+    that can still win. Score terms are applied in the same order as the
+    per-candidate code and variances near a scoring threshold are recomputed
+    with `np.var`, so every score is bit-identical to `analyze_region_detailed`.
+
+    With `scale` > 1 the arrays are a `scale`-times smaller proxy of the page
+    (see `ContentAwarePanelDetector.pyramid_proxy`): pixel distances are
+    converted back to full-resolution pixels before they are compared, and
+    the scores are approximations used to rank candidates.
+    """
+
+    VARIANCE_THRESHOLDS = (100.0, 200.0, 1500.0, 3500.0, 5000.0)
+    VARIANCE_RECHECK_TOLERANCE = 1e-3
+    STRIP_ROWS = 4  # proximity-check strip height in analyze_region_detailed
+
+    def __init__(self, gray, saturation, row_start, row_end, wm_height, wm_width, edge='left', x_margin=0,
+                 bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None, scale=1):
+        self.gray = gray
+        self.saturation = saturation
+        self.img_height, img_width = gray.shape[:2]
+        self.wm_height = wm_height
+        self.scale = scale
+        self.strip_rows = max(1, self.STRIP_ROWS // scale)
+        self.panel_edges = panel_edges
+        self.col_white = col_white
+
+        if edge == 'left':
+            x0, x1 = x_margin, min(x_margin + wm_width, img_width)
+        else:
+            x0, x1 = max(0, img_width - x_margin - wm_width), img_width - x_margin
+        self.x0, self.x1 = x0, x1
+        self.valid = x1 > x0
+        if not self.valid:
+            return
+
+        # Row window covering every candidate footprint plus its proximity strips
+        r0 = max(0, row_start - self.strip_rows)
+        r1 = min(self.img_height, row_end + wm_height + self.strip_rows)
+        self.r0 = r0
+        g = gray[r0:r1, x0:x1]
+
+        def prefix(per_row):
+            out = np.zeros(per_row.shape[0] + 1, dtype=np.int64)
+            np.cumsum(per_row, out=out[1:])
+            return out
+
+        g32 = g.astype(np.uint32)
+        self.p_sum = prefix(g.sum(axis=1, dtype=np.int64))
+        # uint32 row sums of squares are exact for rows narrower than 66000 px
+        self.p_sq = prefix((g32 * g32).sum(axis=1, dtype=np.int64))
+        del g32
+        self.p_sat = prefix(saturation[r0:r1, x0:x1].sum(axis=1, dtype=np.int64)) if saturation is not None else None
+        self.p_white235 = prefix(np.count_nonzero(g > 235, axis=1))
+        self.p_white240 = prefix(np.count_nonzero(g > 240, axis=1))
+        self.p_black30 = prefix(np.count_nonzero(g < 30, axis=1))
+        self.p_dark = prefix(np.count_nonzero((g < 80) & (g > 10), axis=1))
+        self.p_medium = prefix(np.count_nonzero((g >= 80) & (g < 150), axis=1))
+        g16 = g.astype(np.int16)
+        self.p_edge_x = prefix(np.count_nonzero(np.abs(np.diff(g16, axis=1)) > 20, axis=1))
+        # p_edge_y[k] counts edges between window rows (j, j + 1) for j < k
+        self.p_edge_y = prefix(np.count_nonzero(np.abs(np.diff(g16, axis=0)) > 20, axis=1))
+        del g16
+
+        self.mask = None
+        if bubble_mask is not None and bubble_mask.size > 0:
+            ms = mask_scale or ContentAwarePanelDetector.BUBBLE_MASK_SCALE
+            mx0 = min(bubble_mask.shape[1] - 1, x0 // ms)
+            mx1 = min(bubble_mask.shape[1], max(mx0 + 1, (x1 + ms - 1) // ms))
+            self.mask = (ms, bubble_mask.shape[0], mx1 - mx0,
+                         prefix(np.count_nonzero(bubble_mask[:, mx0:mx1], axis=1)))
+
+    def _rows(self, table, a, b):
+        """Sum of `table` over absolute rows [a, b) (arrays)."""
+        return table[b - self.r0] - table[a - self.r0]
+
+    def partial_scores(self, ys, range_start=None, range_end=None, flags=False):
+        """
+        Score every candidate y without the cell-grid overlap term.
+
+        Returns `(head, terms, overlap_possible)`: `head` is the score up to
+        where the overlap penalty is applied, `terms` the remaining additive
+        terms in application order, and `overlap_possible` flags candidates
+        whose score the overlap penalty would change (not a speech bubble).
+        `_fallback_scan`'s segment-corner bonus is the last term when
+        `range_start`/`range_end` are given. With `flags=True` a fourth
+        value maps the per-candidate flags `_ScoreProfile` reports to arrays.
+        """
+        D = ContentAwarePanelDetector
+        ys = np.asarray(ys, dtype=np.int64)
+        y_end = np.minimum(ys + self.wm_height, self.img_height)
+        h = y_end - ys
+        w = self.x1 - self.x0
+        n = h * w
+
+        s1 = self._rows(self.p_sum, ys, y_end)
+        s2 = self._rows(self.p_sq, ys, y_end)
+        mean_brightness = s1 / n
+        variance = (s2 - s1.astype(np.float64) * s1 / n) / n
+        near = np.zeros(len(ys), dtype=bool)
+        for threshold in self.VARIANCE_THRESHOLDS:
+            near |= np.abs(variance - threshold) <= self.VARIANCE_RECHECK_TOLERANCE
+        for i in np.flatnonzero(near):
+            variance[i] = np.var(self.gray[ys[i]:y_end[i], self.x0:self.x1])
+        if self.p_sat is not None:
+            mean_saturation = (self._rows(self.p_sat, ys, y_end) / n) / 255.0
+        else:
+            mean_saturation = np.zeros(len(ys))
+
+        white235 = self._rows(self.p_white235, ys, y_end)
+        very_white_ratio = white235 / n
+        black_ratio = self._rows(self.p_black30, ys, y_end) / n
+        has_text = D.text_pattern_from_counts(n, white235, self._rows(self.p_dark, ys, y_end), self._rows(self.p_medium, ys, y_end))
+        is_speech_bubble = (has_text & (very_white_ratio > 0.15)) | ((very_white_ratio > 0.65) & (mean_saturation < 0.06))
+
+        # Top/bottom halves
+        mid = self.wm_height // 2
+        split = (mid > 0) & (h > mid)
+        ym = np.minimum(ys + mid, y_end)
+        n_top = np.maximum(mid * w, 1)
+        n_bottom = np.maximum((y_end - ym) * w, 1)
+        top_white = self._rows(self.p_white235, ys, ym)
+        bottom_white = self._rows(self.p_white235, ym, y_end)
+        top_text = D.text_pattern_from_counts(n_top, top_white, self._rows(self.p_dark, ys, ym), self._rows(self.p_medium, ys, ym))
+        bottom_text = D.text_pattern_from_counts(n_bottom, bottom_white, self._rows(self.p_dark, ym, y_end), self._rows(self.p_medium, ym, y_end))
+        top_bubble = np.where(split, top_text | ((top_white / n_top > 0.55) & (mean_saturation < 0.08)), is_speech_bubble)
+        bottom_bubble = np.where(split, bottom_text | ((bottom_white / n_bottom > 0.55) & (mean_saturation < 0.08)), is_speech_bubble)
+
+        head = np.full(len(ys), 50.0)
+        head += np.where(is_speech_bubble,
+                         np.where(has_text, -200.0, np.where(very_white_ratio > 0.4, -180.0,
+                                  np.where(very_white_ratio > 0.25, -120.0, -80.0))), 0.0)
+        head += np.where(top_bubble != bottom_bubble, -60.0, 0.0)
+
+        terms = []
+
+        # Connected bubble-mask coverage
+        panel_edges = self.panel_edges
+        if panel_edges:
+            edges = np.unique(np.asarray(panel_edges, dtype=np.int64))
+            dist_top = self._nearest_distance(ys, edges) * self.scale
+            dist_bottom = self._nearest_distance(y_end, edges) * self.scale
+        if self.mask is not None:
+            ms, mask_h, mask_w, p_mask = self.mask
+            clr = max(1, D.MASK_CLEARANCE // self.scale)
+            if panel_edges:
+                clr = np.where(dist_top <= 12, 0, clr)
+            my0 = np.maximum(0, ys - clr) // ms
+            my1 = np.minimum(mask_h, (np.minimum(self.img_height, y_end + clr) + ms - 1) // ms)
+            rows = np.maximum(my1 - my0, 0)
+            covered = p_mask[np.maximum(my1, my0)] - p_mask[my0]
+            mask_overlap = np.where(rows > 0, covered / np.maximum(rows * mask_w, 1), 0.0)
+            terms.append(np.where(mask_overlap > 0.02, -(150 + 400 * np.minimum(mask_overlap, 0.5)), 0.0))
+            if flags:
+                # Top/bottom halves of the mask rows, as analyze_region_detailed splits them
+                half = rows // 2
+                split_at = my0 + half
+                mask_top = np.where(half > 0, (p_mask[split_at] - p_mask[my0]) / np.maximum(half * mask_w, 1), mask_overlap)
+                mask_bottom = np.where(half > 0, (covered - (p_mask[split_at] - p_mask[my0])) / np.maximum((rows - half) * mask_w, 1), mask_overlap)
+        elif flags:
+            mask_overlap = mask_top = mask_bottom = np.zeros(len(ys))
+
+        # Brightness
+        terms.append(np.select(
+            [mean_brightness < 90, mean_brightness > 235, mean_brightness > 220,
+             (mean_brightness >= 100) & (mean_brightness <= 185), (mean_brightness > 185) & (mean_brightness <= 220)],
+            [-np.trunc(130 * (1.0 - mean_brightness / 90.0)), -100.0, -35.0, 35.0, 15.0], 0.0))
+        terms.append(np.select([black_ratio > 0.5, black_ratio > 0.3], [-150.0, -80.0], 0.0))
+
+        # Face / character detail
+        if w > 2:
+            edge_y = self.p_edge_y[np.maximum(y_end - 1 - self.r0, 0)] - self.p_edge_y[ys - self.r0]
+            edge_x = self._rows(self.p_edge_x, ys, y_end)
+            edge_density = (edge_y / np.maximum((h - 1) * w, 1) + edge_x / (h * (w - 1))) / 2
+            edge_density = np.where(h > 2, edge_density, 0.0)
+        else:
+            edge_density = np.zeros(len(ys))
+        is_face = (variance > 1500) & (edge_density > 0.15) & (mean_saturation > 0.1) & (mean_saturation < 0.5)
+        terms.append(np.where(is_face, -(100 * np.minimum(1.0, edge_density * 3)), 0.0))
+
+        terms.append(np.select([mean_saturation > 0.25, mean_saturation > 0.15, mean_saturation > 0.08], [35.0, 20.0, 10.0], 0.0))
+        terms.append(np.select([(variance > 200) & (variance < 3500), variance < 100, variance > 5000], [20.0, -20.0, -20.0], 0.0))
+
+        # Panel-edge affinity
+        if panel_edges:
+            edge_dist = np.minimum(dist_top, dist_bottom)
+            terms.append(np.select(
+                [edge_dist <= 15, edge_dist <= 40, edge_dist <= 90, (edge_dist >= 150) & (len(panel_edges) > 2)],
+                [90.0, 60.0, 25.0, -80.0], 0.0))
+
+        # Proximity strips just above and below the footprint
+        k = self.strip_rows
+        strip_n = k * w
+        top_ok = ys > k
+        if panel_edges:
+            top_ok &= dist_top > 10
+        top_a = np.where(top_ok, ys - k, ys)
+        top_white = self._rows(self.p_white240, top_a, ys)
+        terms.append(np.where(top_ok & (top_white / strip_n > 0.75), -120.0, 0.0))
+        bottom_ok = y_end < self.img_height - k
+        if panel_edges:
+            bottom_ok &= dist_bottom > 10
+        bottom_b = np.where(bottom_ok, y_end + k, y_end)
+        bottom_white = self._rows(self.p_white240, y_end, bottom_b)
+        terms.append(np.where(bottom_ok & (bottom_white / strip_n > 0.75), -120.0, 0.0))
+
+        if range_start is not None and range_end is not None:
+            terms.append(self.segment_corner_bonus(ys, self.wm_height, range_start, range_end, panel_edges))
+
+        if flags:
+            return head, terms, ~is_speech_bubble, {
+                'is_speech_bubble': is_speech_bubble,
+                'top_bubble': top_bubble,
+                'bottom_bubble': bottom_bubble,
+                'is_face': is_face,
+                'mask_overlap': mask_overlap,
+                'mask_top': mask_top,
+                'mask_bottom': mask_bottom,
+            }
+        return head, terms, ~is_speech_bubble
+
+    @staticmethod
+    def _nearest_distance(values, sorted_edges):
+        """Distance from each of `values` to the nearest of `sorted_edges` (ascending, non-empty)."""
+        right = np.searchsorted(sorted_edges, values)
+        above = sorted_edges[np.maximum(right - 1, 0)]
+        below = sorted_edges[np.minimum(right, len(sorted_edges) - 1)]
+        return np.minimum(np.abs(values - above), np.abs(below - values))
+
+    @staticmethod
+    def segment_corner_bonus(ys, wm_height, range_start, range_end, panel_edges):
+        """`_fallback_scan`'s preference for segment corners/edges, for an array of candidate ys."""
+        dist_to_seg = np.minimum(np.abs(ys - range_start), np.abs(ys + wm_height - range_end))
+        no_real_gutters = (not panel_edges) or len(panel_edges) <= 2
+        return np.select(
+            [dist_to_seg <= 50, dist_to_seg <= 120, (dist_to_seg >= 250) & no_real_gutters],
+            [50.0, 25.0, -40.0], 0.0)
+
+    @staticmethod
+    def apply_terms(start, terms, index):
+        """Add `terms` (in order) to `start` for candidate(s) `index`."""
+        score = start
+        for term in terms:
+            score = score + term[index]
+        return score
+
+    def overlap_cells(self, y):
+        """Exact `detect_bubble_overlap` cell count for the footprint at `y`."""
+        y_end = min(y + self.wm_height, self.img_height)
+        _, cells = ContentAwarePanelDetector.detect_bubble_overlap(
+            self.gray, self.saturation, y, y_end, self.x0, self.x1, self.img_height, col_white=self.col_white
+        )
+        return len(cells)
+
+    def best(self, ys, range_start, range_end, best_y, best_score):
+        """
+        Same result as scoring `ys` in order and keeping a candidate only
+        when it beats the incumbent `(best_y, best_score)` strictly — i.e.
+        the earliest candidate with the highest score, if that score is
+        higher — using branch-and-bound on the overlap-free upper bounds.
+        """
+        if len(ys) == 0:
+            return best_y, best_score
+        head, terms, overlap_possible = self.partial_scores(ys, range_start, range_end)
+        upper = self.apply_terms(head, terms, slice(None))
+
+        top_score, top_index = None, None
+        for i in np.lexsort((np.arange(len(ys)), -upper)):
+            bound = upper[i]
+            if bound <= best_score:
+                break
+            if top_score is not None and (bound < top_score or (bound == top_score and i > top_index)):
+                break
+            if overlap_possible[i]:
+                cells = self.overlap_cells(int(ys[i]))
+                score = self.apply_terms(head[i] - 90 * min(cells, 3), terms, i) if cells else bound
+            else:
+                score = bound
+            if top_score is None or score > top_score or (score == top_score and i < top_index):
+                top_score, top_index = score, i
+
+        if top_score is not None and top_score > best_score:
+            return int(ys[top_index]), float(top_score)
+        return best_y, best_score
+
+
+class _ScoreProfile:
+    """
+    `analyze_region_detailed` for every y of one image at one watermark
+    x-range, shared by the searches of all of its segments.
+
+    The score of every footprint position is computed once, in one
+    vectorized pass of a full-height `_FallbackScanScorer` (a 1-D score
+    profile along y). The `detect_bubble_overlap` cell grid, the only
+    per-position check left, runs only for the ys a search actually looks
+    at and is memoized. `analyze(y)` returns the same score as
+    `analyze_region_detailed` plus the flags the placement search reads,
+    so searching through a profile picks exactly the same placements.
+    """
+
+    def __init__(self, gray, saturation, wm_height, wm_width, edge='left', x_margin=0,
+                 bubble_mask=None, mask_scale=None, panel_edges=None, col_white=None):
+        self.img_height = gray.shape[0]
+        self.wm_height = wm_height
+        self.region_args = (gray, saturation, wm_height, wm_width, self.img_height, edge, x_margin)
+        self.region_kwargs = dict(bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white)
+        self.scorer = _FallbackScanScorer(
+            gray, saturation, 0, self.img_height, wm_height, wm_width, edge, x_margin,
+            bubble_mask=bubble_mask, mask_scale=mask_scale, panel_edges=panel_edges, col_white=col_white
+        )
+        self.valid = self.scorer.valid and self.img_height > wm_height
+        self._memo = {}
+        if not self.valid:
+            return
+        ys = np.arange(self.img_height - wm_height + 1)
+        self.head, self.terms, _, self.flags = self.scorer.partial_scores(ys, flags=True)
+        self.upper = self.scorer.apply_terms(self.head, self.terms, slice(None))
+
+    def analyze(self, y):
+        """`(score, info)` for the footprint at `y`; `info` holds the bubble/face flags."""
+        result = self._memo.get(y)
+        if result is None:
+            result = self._memo[y] = self._analyze(y)
+        return result
+
+    def _analyze(self, y):
+        if not 0 <= y < len(self.upper):
+            gray, saturation, wm_height, wm_width, img_height, edge, x_margin = self.region_args
+            return ContentAwarePanelDetector.analyze_region_detailed(
+                gray, saturation, y, wm_height, wm_width, img_height, edge, x_margin, **self.region_kwargs
+            )
+        s, f = self.scorer, self.flags
+        _, cells = ContentAwarePanelDetector.detect_bubble_overlap(
+            s.gray, s.saturation, y, y + self.wm_height, s.x0, s.x1, self.img_height, col_white=s.col_white
+        )
+        is_speech_bubble = bool(f['is_speech_bubble'][y])
+        if cells and not is_speech_bubble:
+            score = float(s.apply_terms(self.head[y] - 90 * min(len(cells), 3), self.terms, y))
+        else:
+            score = float(self.upper[y])
+
+        overlap_rows = {r for r, _ in cells}
+        mask_hit = f['mask_overlap'][y] > 0.02
+        mask_top, mask_bottom = f['mask_top'][y], f['mask_bottom'][y]
+        top_bubble, bottom_bubble = bool(f['top_bubble'][y]), bool(f['bottom_bubble'][y])
+        return score, {
+            'is_speech_bubble': is_speech_bubble,
+            'bubble_overlap': bool(cells) or bool(mask_hit),
+            'is_face': bool(f['is_face'][y]),
+            'bubble_at_top': ((top_bubble and not bottom_bubble) or (0 in overlap_rows and 2 not in overlap_rows)
+                              or bool(mask_hit and mask_top > 2 * mask_bottom)),
+            'bubble_at_bottom': ((bottom_bubble and not top_bubble) or (2 in overlap_rows and 0 not in overlap_rows)
+                                 or bool(mask_hit and mask_bottom > 2 * mask_top)),
+        }
+
+
+def _hsv_saturation_lut():
+    """
+    PIL's HSV 'S' for every channel (max, max - min) pair, flattened as
+    `lut[max << 8 | spread]`. Pillow computes `(int)((float)spread / max * 255.0)`:
+    a float32 ratio widened to double before the scale, then truncated.
+    """
+    maxc = np.arange(256, dtype=np.float32)[:, None]
+    spread = np.arange(256, dtype=np.float32)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.trunc((spread / maxc).astype(np.float64) * 255.0)
+    s = np.where((spread > 0) & (spread <= maxc), s, 0)
+    return np.clip(s, 0, 255).astype(np.uint8).ravel()
+
+
+_HSV_SATURATION_LUT = _hsv_saturation_lut()
+
+
+def _fill_gray_saturation(rgb, gray_out, saturation_out):
+    """PIL 'L' and HSV 'S' of an (h, w, >=3) uint8 array, written into the two (h, w) outputs."""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    # ITU-R 601-2 luma in Pillow's 16-bit fixed point. The products are
+    # computed in uint32 explicitly: NumPy 1.x would type uint8 * uint32
+    # scalar by value as uint16 and overflow.
+    luma = np.multiply(r, 19595, dtype=np.uint32)
+    luma += np.multiply(g, 38470, dtype=np.uint32)
+    luma += np.multiply(b, 7471, dtype=np.uint32)
+    luma += 0x8000
+    luma >>= 16
+    gray_out[...] = luma
+    maxc = np.maximum(np.maximum(r, g), b)
+    index = maxc.astype(np.uint16) << 8
+    index |= maxc - np.minimum(np.minimum(r, g), b)
+    _HSV_SATURATION_LUT.take(index, out=saturation_out)
+
+
+def gray_and_saturation(img, chunk_rows=ANALYSIS_CHUNK_ROWS):
+    """
+    PIL 'L' and HSV 'S' arrays (uint8) of `img`, produced together.
+
+    Same values as `np.array(img.convert('L'))` and
+    `np.array(img.convert('RGB').convert('HSV').getchannel('S'))` (checked
+    over the whole RGB cube), but built `chunk_rows` rows at a time straight
+    from the RGB pixels: besides the two outputs only one chunk of scratch
+    is allocated, instead of full-image L, RGB and 3-channel HSV copies.
+    """
+    width, height = img.size
+    gray = np.empty((height, width), dtype=np.uint8)
+    saturation = np.empty((height, width), dtype=np.uint8)
+    for top in range(0, height, chunk_rows):
+        bottom = min(height, top + chunk_rows)
+        chunk = img.crop((0, top, width, bottom))
+        if chunk.mode in ('RGB', 'RGBA'):
+            _fill_gray_saturation(np.asarray(chunk), gray[top:bottom], saturation[top:bottom])
+        elif chunk.mode == 'L':
+            gray[top:bottom] = np.asarray(chunk)
+            saturation[top:bottom] = 0
+        else:
+            # Other modes: PIL's own 'L' conversion, saturation from the RGB conversion
+            gray[top:bottom] = np.asarray(chunk.convert('L'))
+            rgb = chunk.convert('RGB')
+            _fill_gray_saturation(np.asarray(rgb), np.empty((bottom - top, width), dtype=np.uint8), saturation[top:bottom])
+            rgb.close()
+        chunk.close()
+    return gray, saturation
+
+
+class ChapterAnalysis:
+    """
+    Shared analysis cache for one stitched composite.
+
+    Cut detection and every slice's watermark search used to convert the
+    same pixels again and again (`convert('L')`, `convert('HSV')`, gutter
+    rows, bubble masks). This object computes them once: grayscale and
+    saturation are built lazily in bands of `BAND_ROWS` rows (with exactly
+    PIL's 'L' and HSV 'S' values) and kept until `close()`; per-row gutter
+    types are derived from the same bands; bubble masks are cached per
+    slice range. Accessors return views (or band-spanning copies) in
+    composite coordinates.
+    """
+
+    BAND_ROWS = 2048
+
+    def __init__(self, image):
+        self.image = image
+        self.width, self.height = image.size
+        self._bands = {}
+        self._row_types = {}
+        self._masks = {}
+        self._lock = threading.Lock()
+        self._band_locks = {}
+
+    def _band_lock(self, key):
+        with self._lock:
+            lock = self._band_locks.get(key)
+            if lock is None:
+                lock = self._band_locks[key] = threading.Lock()
+            return lock
+
+    def _compute_band(self, cache, index, compute):
+        """Fetch band `index` from `cache`, computing it once (thread-safe) on first use."""
+        band = cache.get(index)
+        if band is not None:
+            return band
+        with self._band_lock((id(cache), index)):
+            band = cache.get(index)
+            if band is None:
+                band = cache[index] = compute(index)
+        return band
+
+    def _crop_band(self, index):
+        top = index * self.BAND_ROWS
+        return self.image.crop((0, top, self.width, min(self.height, top + self.BAND_ROWS)))
+
+    def _analysis_band(self, index):
+        """(gray, saturation) of band `index`, both from one fused pass."""
+        def compute(i):
+            band = self._crop_band(i)
+            arrays = gray_and_saturation(band)
+            band.close()
+            return arrays
+        return self._compute_band(self._bands, index, compute)
+
+    def _gray_band(self, index):
+        return self._analysis_band(index)[0]
+
+    def _saturation_band(self, index):
+        return self._analysis_band(index)[1]
+
+    def _row_types_band(self, index):
+        def compute(i):
+            return ContentAwarePanelDetector.classify_gutter_rows(self._gray_band(i), self._saturation_band(i))
+        return self._compute_band(self._row_types, index, compute)
+
+    def _rows(self, band_getter, y0, y1):
+        """Rows [y0, y1) assembled from bands: a view when they fall in one band, else a copy."""
+        y0 = max(0, y0)
+        y1 = min(self.height, y1)
+        first = y0 // self.BAND_ROWS
+        last = max(first, (y1 - 1) // self.BAND_ROWS)
+        parts = []
+        for index in range(first, last + 1):
+            top = index * self.BAND_ROWS
+            band = band_getter(index)
+            parts.append(band[max(0, y0 - top):max(0, y1 - top)])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def gray(self, y0, y1):
+        """PIL 'L' values of rows [y0, y1)."""
+        return self._rows(self._gray_band, y0, y1)
+
+    def saturation(self, y0, y1):
+        """PIL HSV 'S' values of rows [y0, y1)."""
+        return self._rows(self._saturation_band, y0, y1)
+
+    def gutters(self, y0, y1):
+        """Gutters of rows [y0, y1), in range-local coordinates (same result as `find_gutters` on the crop)."""
+        return ContentAwarePanelDetector.gutters_from_row_types(self._rows(self._row_types_band, y0, y1))
+
+    def bubble_mask(self, y0, y1):
+        """Bubble mask of rows [y0, y1) (built once per range)."""
+        key = (y0, y1)
+        mask = self._masks.get(key)
+        if mask is None:
+            with self._band_lock(('mask', key)):
+                mask = self._masks.get(key)
+                if mask is None:
+                    mask = self._masks[key] = ContentAwarePanelDetector.build_bubble_mask(self.gray(y0, y1), self.saturation(y0, y1))
+        return mask
+
+    def release_masks(self):
+        """Drop the cached bubble masks (the grayscale/saturation bands stay)."""
+        with self._lock:
+            self._masks.clear()
+
+    def row_uniform_map(self, ignorable_pixels, threshold):
+        """Cut-detection row-uniformity map computed from the cached grayscale bands."""
+        uniform = np.zeros(self.height, dtype=bool)
+        for index in range(0, (self.height + self.BAND_ROWS - 1) // self.BAND_ROWS):
+            top = index * self.BAND_ROWS
+            gray = self._gray_band(index)
+            uniform[top:top + gray.shape[0]] = _row_uniform_map(gray, ignorable_pixels, threshold)
+        return uniform
+
+    def close(self):
+        """Drop every cached array."""
+        with self._lock:
+            self._bands.clear()
+            self._row_types.clear()
+            self._masks.clear()
+            self._band_locks.clear()
+
+
+class WatermarkPlacementCache:
+    """
+    Persistent LRU cache of content-aware watermark placements.
+
+    Re-exporting a chapter (another output format, one page fixed, ...)
+    repeats the placement search on pixels it has already seen. Entries are
+    keyed by a blake2b hash of the analysed grayscale and saturation arrays
+    plus the watermark file key (path, mtime_ns, size), the scaled watermark
+    size and the count/edge/margin parameters, so a hit returns exactly what
+    the search would and skips the detector. Beyond MAX_ENTRIES the least
+    recently used entries are evicted. Hits only reorder the entries in
+    memory; the file is rewritten after puts, so a fully warm run leaves
+    it untouched.
+    """
+
+    VERSION = 1
+    MAX_ENTRIES = 20000
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._load()
+
+    def _load(self):
+        """Read the cache file, ignoring it if it is missing, corrupt or from another version."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION and isinstance(data.get('entries'), dict):
+                self._entries = data['entries']
+        except (OSError, ValueError, AttributeError):
+            self._entries = {}
+
+    @staticmethod
+    def key(gray, saturation, watermark_path, wm_size, count, edge, margin, search_mode='exhaustive'):
+        """Cache key for a search over `gray`/`saturation` with these watermark parameters."""
+        digest = hashlib.blake2b(digest_size=20)
+        params = (gray.shape, _watermark_cache_key(watermark_path), tuple(wm_size), count, edge, margin)
+        if search_mode != 'exhaustive':
+            params += (search_mode,)
+        digest.update(repr(params).encode('utf-8'))
+        digest.update(np.ascontiguousarray(gray))
+        digest.update(np.ascontiguousarray(saturation))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Cached placements for `key` (a list of `(x, y)`), or None on a miss."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[key] = entry  # most recently used goes last
+            self.hits += 1
+        return [tuple(p) for p in entry]
+
+    def put(self, key, placements):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = [[int(x), int(y)] for x, y in placements]
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.pop(next(iter(self._entries)))
+            self._dirty = True
+
+    def counts(self):
+        """Current `(hits, misses)` totals, e.g. to measure one job's share."""
+        with self._lock:
+            return self.hits, self.misses
+
+    def report(self, since, job_stats=None):
+        """Save the cache, print the hits/misses since `counts()` returned `since` and add them to `job_stats` (a dict), if given."""
+        self.save()
+        hits, misses = self.counts()
+        hits -= since[0]
+        misses -= since[1]
+        if not hits and not misses:
+            return
+        print(f"Watermark placement cache: {hits} hits, {misses} misses")
+        if job_stats is not None:
+            job_stats['placement_cache_hits'] = job_stats.get('placement_cache_hits', 0) + hits
+            job_stats['placement_cache_misses'] = job_stats.get('placement_cache_misses', 0) + misses
+
+    def save(self):
+        """Write the cache back to disk (atomically) if it changed."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {'version': self.VERSION, 'entries': dict(self._entries)}
+            self._dirty = False
+        try:
+            _write_json_atomic(self.path, payload)
+        except OSError as e:
+            print(f"Warning: Could not save watermark placement cache: {e}")
+
+
+_PLACEMENT_CACHE = None
+_PLACEMENT_CACHE_LOCK = threading.Lock()
+
+
+def get_placement_cache():
+    """Process-wide `WatermarkPlacementCache`, loaded from `WATERMARK_PLACEMENT_CACHE_PATH` on first use."""
+    global _PLACEMENT_CACHE
+    with _PLACEMENT_CACHE_LOCK:
+        if _PLACEMENT_CACHE is None:
+            _PLACEMENT_CACHE = WatermarkPlacementCache(WATERMARK_PLACEMENT_CACHE_PATH)
+        return _PLACEMENT_CACHE
+
+
+def _cached_placements(gray, saturation, watermark_path, wm_size, count, edge, margin, search, search_mode='exhaustive',
+                       use_cache=True):
+    """Placements for these analysed pixels from the placement cache, running `search()` on a miss (or always, without `use_cache`)."""
+    if not use_cache:
+        return search()
+    cache = get_placement_cache()
+    key = cache.key(gray, saturation, watermark_path, wm_size, count, edge, margin, search_mode)
+    placements = cache.get(key)
+    if placements is None:
+        placements = search()
+        cache.put(key, placements)
+    return placements
+
+
+def compute_watermark_placements(img, watermark_path, count, edge, watermark_width_percent=12, margin=0, analysis=None, y_offset=0,
+                                 search_mode='exhaustive', placement_cache=True):
     """
     Computes the best positions for `count` watermarks on `img` using the
     ContentAwarePanelDetector logic, WITHOUT modifying the image.
 
+    When `img` is a crop of a composite starting at row `y_offset`, passing
+    that composite's `ChapterAnalysis` reuses its cached grayscale,
+    saturation, gutter and bubble-mask data instead of recomputing them.
+    Results are served from the persistent `WatermarkPlacementCache` when
+    the same pixels were searched with the same watermark settings before;
+    `placement_cache=False` skips the cache (and the pixel hashing).
+    `search_mode` is passed to `find_best_watermark_position`.
+
     Returns a tuple `(wm, placements)` where `wm` is the resized watermark
     (PIL image) and `placements` is a list of `(x, y)` positions.
     Returns `(None, [])` if the watermark cannot be loaded.
@@ -1900,66 +4266,171 @@ def compute_watermark_placements(img, watermark_path, count, edge, watermark_wid
             return None, []
         wm_w, wm_h = wm.size
 
-        # Precalculate gray and saturation once for the entire image using native PIL conversions.
-        # Saturation stays uint8 (PIL's native S channel) — no float32 copy of the
+        # Precalculate gray and saturation once for the entire image (PIL 'L' and
+        # HSV 'S' values). Saturation stays uint8 — no float32 copy of the
         # whole image, which for a tall page saves tens of MB and a full-image division.
-        gray = np.array(img.convert('L'))
-        # Convert to RGB first to ensure HSV conversion is fully supported across all
-        # PIL versions (skipping the copy when the image is already RGB)
-        rgb_src = img if img.mode == 'RGB' else img.convert('RGB')
-        saturation = np.array(rgb_src.convert('HSV').getchannel('S'))
+        if analysis is not None:
+            gray = analysis.gray(y_offset, y_offset + H)
+            saturation = analysis.saturation(y_offset, y_offset + H)
+        else:
+            gray, saturation = gray_and_saturation(img)
 
-        # Whole-image connected bubble mask (built once, shared by all segments):
-        # covers each bubble's full outline including its tail.
-        bubble_mask = ContentAwarePanelDetector.build_bubble_mask(gray, saturation)
-        mask_scale = ContentAwarePanelDetector.BUBBLE_MASK_SCALE
+        def search():
+            if analysis is not None:
+                bubble_mask = analysis.bubble_mask(y_offset, y_offset + H)
+                gutters = analysis.gutters(y_offset, y_offset + H)
+            else:
+                # Whole-image connected bubble mask (built once, shared by all segments):
+                # covers each bubble's full outline including its tail.
+                bubble_mask = ContentAwarePanelDetector.build_bubble_mask(gray, saturation)
 
-        # Whole-image gutter list (built once, shared by all segments — it was
-        # previously recomputed from scratch inside every segment's search).
-        gutters = ContentAwarePanelDetector.find_gutters(gray, saturation)
+                # Whole-image gutter list (built once, shared by all segments — it was
+                # previously recomputed from scratch inside every segment's search).
+                gutters = ContentAwarePanelDetector.find_gutters(gray, saturation)
+            return _search_segment_placements(img, W, H, wm.size, count, edge, margin, gray, saturation, bubble_mask, gutters,
+                                              search_mode=search_mode)
 
-        # Segment page height into `count` segments
-        segment_height = H / float(count)
+        return wm, _cached_placements(gray, saturation, watermark_path, wm.size, count, edge, margin, search, search_mode,
+                                      use_cache=placement_cache)
 
-        placements = []
-        for i in range(count):
-            seg_start = int(i * segment_height)
-            seg_end = int((i + 1) * segment_height)
+    except Exception as e:
+        print(f"Error computing watermark placements: {e}")
+        return None, []
 
-            if seg_end - seg_start < wm_h:
-                continue
 
-            # Find watermark position using the content-aware panel detector
-            x_pos, y_pos, score, edge_info = ContentAwarePanelDetector.find_best_watermark_position(
-                img, W, H, wm_w, wm_h, seg_start, seg_end, edge=edge, x_margin=margin,
-                gray=gray, saturation=saturation, bubble_mask=bubble_mask, mask_scale=mask_scale,
-                gutters=gutters
-            )
+def _search_segment_placements(img, W, H, wm_size, count, edge, margin, gray, saturation, bubble_mask, gutters,
+                               search_mode='exhaustive'):
+    """
+    Content-aware search of one watermark position per vertical segment of a
+    W x H image whose analysis arrays are given. The watermark's column
+    whiteness over the full height (and, in 'pyramid' `search_mode`, the
+    downscaled proxy) is the same for every segment, so it is computed once
+    here rather than once per segment. With several segments the exhaustive
+    search reads its scores from one `_ScoreProfile` of the whole image, so
+    its cost follows the image height rather than the number of candidates
+    each segment visits; the placements are unchanged. Pyramid mode falls
+    back to that search when the segments are shorter than
+    `ContentAwarePanelDetector.PYRAMID_MIN_SEGMENT`.
+    """
+    wm_w, wm_h = wm_size
+    mask_scale = ContentAwarePanelDetector.BUBBLE_MASK_SCALE
+    if search_mode == 'pyramid' and H / float(count) < ContentAwarePanelDetector.PYRAMID_MIN_SEGMENT:
+        search_mode = 'exhaustive'
 
-            # Ensure y_pos is within bounds
-            y_pos = max(seg_start, min(y_pos, seg_end - wm_h))
-            placements.append((x_pos, y_pos))
+    if edge == 'left':
+        cw_x0, cw_x1 = margin, min(margin + wm_w, W)
+    else:
+        cw_x0, cw_x1 = max(0, W - margin - wm_w), W - margin
+    col_white = None
+    if cw_x1 > cw_x0:
+        col_white = np.mean(gray[:, cw_x0:cw_x1] > ContentAwarePanelDetector.BUBBLE_WHITE_THRESHOLD, axis=0)
+    proxy = profile = None
+    if search_mode == 'pyramid':
+        proxy = ContentAwarePanelDetector.pyramid_proxy(gray, saturation, cw_x0, cw_x1)
+    elif count > 1:
+        profile = _ScoreProfile(
+            gray, saturation, wm_h, wm_w, edge, margin, bubble_mask=bubble_mask, mask_scale=mask_scale,
+            panel_edges=ContentAwarePanelDetector.panel_edges(gutters, H), col_white=col_white
+        )
+        if not profile.valid:
+            profile = None
 
-        return wm, placements
+    # Segment page height into `count` segments
+    segment_height = H / float(count)
 
-    except Exception as e:
-        print(f"Error computing watermark placements: {e}")
-        return None, []
+    placements = []
+    for i in range(count):
+        seg_start = int(i * segment_height)
+        seg_end = int((i + 1) * segment_height)
+
+        if seg_end - seg_start < wm_h:
+            continue
+
+        # Find watermark position using the content-aware panel detector
+        x_pos, y_pos, score, edge_info = ContentAwarePanelDetector.find_best_watermark_position(
+            img, W, H, wm_w, wm_h, seg_start, seg_end, edge=edge, x_margin=margin,
+            gray=gray, saturation=saturation, bubble_mask=bubble_mask, mask_scale=mask_scale,
+            gutters=gutters, col_white=col_white, search_mode=search_mode, proxy=proxy, profile=profile
+        )
+
+        # Ensure y_pos is within bounds
+        y_pos = max(seg_start, min(y_pos, seg_end - wm_h))
+        placements.append((x_pos, y_pos))
+
+    return placements
+
+
+def plan_slice_watermarks(analysis, cut_points, watermark_path, count, edge, watermark_width_percent=12, margin=0, max_workers=4,
+                          search_mode='exhaustive', placement_cache=True):
+    """
+    Watermark placements for every slice of a stitched composite, computed up
+    front from its `ChapterAnalysis` instead of from each cropped slice.
+
+    Each slice [cut_points[i-1], cut_points[i]) gets the same search the
+    per-slice path runs (same segment split, gutters, bubble mask and
+    scoring), so the placements match it exactly; no slice is cropped and
+    the total work follows the chapter height. Slices are planned in
+    parallel (the analysis is thread-safe) and the per-slice bubble masks
+    are dropped once planning is done. Slices already in the
+    `WatermarkPlacementCache` skip the search (unless `placement_cache` is
+    False). `search_mode` is passed to `find_best_watermark_position`.
+
+    Returns a dict mapping slice index (1-based) to `(wm, placements)` as
+    returned by `compute_watermark_placements`.
+    """
+    if not watermark_path or not os.path.exists(watermark_path):
+        return {}
+
+    W = analysis.width
+
+    def plan(index):
+        y0, y1 = cut_points[index - 1], cut_points[index]
+        H = y1 - y0
+        try:
+            wm = _prepare_watermark_for_canvas(watermark_path, W, H, count)
+            if wm is None:
+                return index, (None, [])
+            gray, saturation = analysis.gray(y0, y1), analysis.saturation(y0, y1)
+            placements = _cached_placements(
+                gray, saturation, watermark_path, wm.size, count, edge, margin,
+                lambda: _search_segment_placements(
+                    None, W, H, wm.size, count, edge, margin, gray, saturation,
+                    analysis.bubble_mask(y0, y1), analysis.gutters(y0, y1), search_mode=search_mode
+                ),
+                search_mode, use_cache=placement_cache
+            )
+            return index, (wm, placements)
+        except Exception as e:
+            print(f"Error computing watermark placements: {e}")
+            return index, (None, [])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        planned = dict(executor.map(plan, range(1, len(cut_points))))
+    analysis.release_masks()
+    return planned
 
 
-def apply_watermark(img, watermark_path, count, edge, watermark_width_percent=12, margin=0):
+def apply_watermark(img, watermark_path, count, edge, watermark_width_percent=12, margin=0, analysis=None, y_offset=0, planned=None,
+                    search_mode='exhaustive', placement_cache=True):
     """
     Applies `count` watermarks to `img` at the best locations on the left or right edge.
     Uses the advanced ContentAwarePanelDetector logic with deterministic fallback.
+    `analysis`/`y_offset`/`search_mode`/`placement_cache` are forwarded to `compute_watermark_placements`;
+    `planned` is a precomputed `(wm, placements)` (see `plan_slice_watermarks`)
+    that skips the search entirely.
     """
     try:
         # Ensure img is writeable and in RGB/RGBA
         if img.mode not in ('RGB', 'RGBA'):
             img = img.convert('RGB')
 
-        wm, placements = compute_watermark_placements(
-            img, watermark_path, count, edge, watermark_width_percent, margin
-        )
+        if planned is not None:
+            wm, placements = planned
+        else:
+            wm, placements = compute_watermark_placements(
+                img, watermark_path, count, edge, watermark_width_percent, margin,
+                analysis=analysis, y_offset=y_offset, search_mode=search_mode, placement_cache=placement_cache
+            )
         if wm is None and watermark_path and os.path.exists(watermark_path):
             wm = _prepare_watermark_for_canvas(watermark_path, img.width, img.height, count)
         if wm is not None and not placements:
@@ -1978,7 +4449,7 @@ def apply_watermark(img, watermark_path, count, edge, watermark_width_percent=12
     return img
 
 
-def _save_multilayer_psd(path: str, base_image: Image.Image, placements: list) -> bool:
+def _save_multilayer_psd(path: str, base_image: Image.Image, placements: list, zlib_level: int = 6) -> bool:
     """Write a Photoshop-compatible PSD with the slice art as the background layer and
     each watermark as its own movable/editable layer on top.
 
@@ -1988,9 +4459,10 @@ def _save_multilayer_psd(path: str, base_image: Image.Image, placements: list) -
     the Adobe PSD spec section-by-section and matches Photoshop's own output.
 
     Args:
-        path: target .psd file
+        path: target .psd file, or a writable binary file object
         base_image: PIL RGB image — the slice art (becomes the "Art" layer)
         placements: list of {"image": PIL RGBA, "x": int, "y": int, "name": str}
+        zlib_level: deflate level for the channel data (see `ENCODER_PROFILES`)
 
     Returns True on success.
     """
@@ -2041,7 +4513,7 @@ def _save_multilayer_psd(path: str, base_image: Image.Image, placements: list) -
         Zip is in the PSD spec and Photoshop opens it. It's also 10-50× faster than
         Python-level RLE/PackBits for big channels.
         """
-        return be_u16(2) + zlib.compress(arr_2d.tobytes(), 6)
+        return be_u16(2) + zlib.compress(arr_2d.tobytes(), zlib_level)
 
     try:
         # ── Canvas / Art layer ──
@@ -2194,13 +4666,15 @@ def _save_multilayer_psd(path: str, base_image: Image.Image, placements: list) -
             ir_block += b"\x00"
         image_resources = be_u32(len(ir_block)) + ir_block
 
-        # ── Write the file ──
-        with open(path, "wb") as f:
-            f.write(header)
-            f.write(color_mode_data)
-            f.write(image_resources)
-            f.write(layer_mask_section)
-            f.write(merged_section)
+        # ── Write the file (or caller-provided binary stream) ──
+        sections = (header, color_mode_data, image_resources, layer_mask_section, merged_section)
+        if hasattr(path, "write"):
+            for section in sections:
+                path.write(section)
+        else:
+            with open(path, "wb") as f:
+                for section in sections:
+                    f.write(section)
         return True
     except Exception as e:
         import traceback
@@ -2209,9 +4683,10 @@ def _save_multilayer_psd(path: str, base_image: Image.Image, placements: list) -
         return False
 
 
-def save_psd_layered(img, filepath, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0):
+def save_psd_layered(img, filepath, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0, analysis=None, y_offset=0, planned=None, zlib_level=6, search_mode='exhaustive', placement_cache=True):
     """
-    Saves `img` as a PSD file.
+    Saves `img` as a PSD file (channel data deflated at `zlib_level`).
+    `search_mode` and `placement_cache` are passed to `compute_watermark_placements`.
 
     When the watermark is enabled, the watermark is NOT baked into the pixels;
     instead the base image and each watermark are written as separate layers so
@@ -2233,9 +4708,13 @@ def save_psd_layered(img, filepath, watermark_enabled=False, watermark_path="",
         wm = None
         placements = []
         try:
-            wm, placements = compute_watermark_placements(
-                img, watermark_path, watermark_count, watermark_edge, watermark_width_percent, margin=watermark_margin
-            )
+            if planned is not None:
+                wm, placements = planned
+            else:
+                wm, placements = compute_watermark_placements(
+                    img, watermark_path, watermark_count, watermark_edge, watermark_width_percent, margin=watermark_margin,
+                    analysis=analysis, y_offset=y_offset, search_mode=search_mode, placement_cache=placement_cache
+                )
         except Exception as e:
             print(f"Error computing watermark placements for PSD: {e}")
 
@@ -2266,7 +4745,7 @@ def save_psd_layered(img, filepath, watermark_enabled=False, watermark_path="",
                 )
 
     # Use the hand-rolled PSD writer instead of psd-tools to avoid compatibility issues.
-    success = _save_multilayer_psd(filepath, img, placements_dict)
+    success = _save_multilayer_psd(filepath, img, placements_dict, zlib_level=zlib_level)
     if not success:
         print(f"Warning: Hand-rolled layered PSD saving failed, falling back to basic flat image save.")
         # Fallback to basic flat image save using Pillow
@@ -2275,15 +4754,32 @@ def save_psd_layered(img, filepath, watermark_enabled=False, watermark_path="",
         img.save(filepath)
 
 
-def mergerImages(mode, newWidth, isChecked, imagePaths, saveFormat, SaveQuality, saveDirectory, heightLimit, current_date, is_zip, isPdf, isNoStitch=False, isCbz=False, progress_callback=None, webp_fallback_callback=None, output_base="./Results", max_workers=4, filename_pattern="[number]", filename_digits=3, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0):
+def mergerImages(mode, newWidth, isChecked, imagePaths, saveFormat, SaveQuality, saveDirectory, heightLimit, current_date, is_zip, isPdf, isNoStitch=False, isCbz=False, progress_callback=None, webp_fallback_callback=None, output_base="./Results", max_workers=4, filename_pattern="[number]", filename_digits=3, watermark_enabled=False, watermark_path="", watermark_count=1, watermark_edge="right", watermark_width_percent=12, watermark_margin=0, virtual_strip=False, decode_backend='thread', cut_planner='greedy', encode_backend='thread', encoder_profile=DEFAULT_ENCODER_PROFILE, target_bytes=None, job_stats=None, watermark_search='exhaustive', placement_cache=True):
     """
     Main orchestration function for image processing.
     Determines whether to stitch images or process them individually (no-stitch mode).
+    With `virtual_strip`, stitched mode slices from a lazy `VirtualStrip`
+    instead of materializing the full canvas (bounded memory on long chapters).
+    `decode_backend` selects the stitcher's page-decoding pool ('thread' or 'process').
+    `cut_planner` selects the slicer's cut search ('greedy', the default, or the slower 'optimal').
+    `encode_backend` selects the slicer's slice-encoding pool ('thread' or 'process').
+    `encoder_profile` names the `ENCODER_PROFILES` entry used for every output file.
+    `target_bytes` sets a per-file byte budget for JPEG/WebP output (quality is
+    searched per file); the size change against `SaveQuality` is reported and
+    accumulated into `job_stats` (a dict), if given, as are the watermark
+    placement-cache hits/misses.
+    `watermark_search` selects the watermark position search ('exhaustive' or 'pyramid');
+    `placement_cache=False` bypasses the persistent watermark placement cache.
     """
     images = getAllImagesDirectory(imagePaths)
     if len(images) == 0:
         return False
 
+    # Scan every header once, in parallel; later stages read the shared index.
+    metadata_index = get_metadata_index()
+    metadata_index.prefetch(images, max_workers=max_workers)
+    metadata_index.save()
+
     # If no-stitch mode is selected with WebP output and any single image exceeds WebP's
     # maximum height limit, fall back to stitched mode (where cut points are capped under the limit)
     # and notify via callback.
@@ -2326,16 +4822,22 @@ def mergerImages(mode, newWidth, isChecked, imagePaths, saveFormat, SaveQuality,
             watermark_enabled=watermark_enabled, watermark_path=watermark_path,
             watermark_count=watermark_count, watermark_edge=watermark_edge,
             watermark_width_percent=watermark_width_percent,
-            watermark_margin=watermark_margin
+            watermark_margin=watermark_margin,
+            encoder_profile=encoder_profile,
+            target_bytes=target_bytes, job_stats=job_stats,
+            watermark_search=watermark_search, placement_cache=placement_cache
         )
     else:
         # Stitched processing
-        result = get_concat_v_optimized(images, newWidth, isChecked, max_workers=max_workers)
+        if virtual_strip:
+            result = build_virtual_strip(images, newWidth, isChecked)
+        else:
+            result = get_concat_v_optimized(images, newWidth, isChecked, max_workers=max_workers, decode_backend=decode_backend, shared=(encode_backend == 'process'))
         if result is None:
             return False
 
         SlicerCount = int(result.height) / heightLimit if heightLimit > 0 else 1
-        slicer(result, saveFormat, SlicerCount, SaveQuality, mode, current_date, saveDirectory, is_zip, isPdf, isCbz, progress_callback, output_base=output_base, max_workers=max_workers, filename_pattern=filename_pattern, filename_digits=filename_digits, watermark_enabled=watermark_enabled, watermark_path=watermark_path, watermark_count=watermark_count, watermark_edge=watermark_edge, watermark_width_percent=watermark_width_percent, watermark_margin=watermark_margin)
+        slicer(result, saveFormat, SlicerCount, SaveQuality, mode, current_date, saveDirectory, is_zip, isPdf, isCbz, progress_callback, output_base=output_base, max_workers=max_workers, filename_pattern=filename_pattern, filename_digits=filename_digits, watermark_enabled=watermark_enabled, watermark_path=watermark_path, watermark_count=watermark_count, watermark_edge=watermark_edge, watermark_width_percent=watermark_width_percent, watermark_margin=watermark_margin, cut_planner=cut_planner, encode_backend=encode_backend, encoder_profile=encoder_profile, target_bytes=target_bytes, job_stats=job_stats, watermark_search=watermark_search, placement_cache=placement_cache)
         
         result.close()
         return True
@@ -22,6 +22,7 @@ import shutil
 from PIL import Image
 from io import BytesIO
 import threading
+import multiprocessing
 import platform
 import pyperclip
 import traceback
@@ -395,11 +396,6 @@ def apply_settings(window, settings):
     """
     window.evaluate_js(js_code)
 
-temp_dir = tempfile.TemporaryDirectory()
-os.environ["WEBVIEW2_USER_DATA_FOLDER"] = temp_dir.name
-
-os.makedirs("Results", exist_ok=True)
-
 if current_os == "Windows":
     DWMWA_USE_IMMERSIVE_DARK_MODE = 20
     user32 = ctypes.WinDLL("user32", use_last_error=True)
@@ -1331,61 +1327,80 @@ class Api:
         """Close and destroy the application window."""
         window.destroy()
 
-base_w = 510
-base_h = 830
-screens = webview.screens
-screen = screens[0]
-screen_width = screen.width
-screen_height = screen.height
-
-if screen_height < 900:
-    safe_height = screen_height - 100
-    if base_h > safe_height:
-        ratio = safe_height / base_h
-        final_h = int(safe_height)
-        final_w = int(base_w * ratio)
+def main():
+    """
+    Create the app window and run the GUI event loop.
+
+    Kept out of module scope so that worker processes started with the
+    'spawn' method (Windows, macOS, frozen builds), which re-import this
+    module, do not open a second window or create another temp folder.
+    """
+    global temp_dir, window
+
+    temp_dir = tempfile.TemporaryDirectory()
+    os.environ["WEBVIEW2_USER_DATA_FOLDER"] = temp_dir.name
+
+    os.makedirs("Results", exist_ok=True)
+
+    base_w = 510
+    base_h = 830
+    screens = webview.screens
+    screen = screens[0]
+    screen_width = screen.width
+    screen_height = screen.height
+
+    if screen_height < 900:
+        safe_height = screen_height - 100
+        if base_h > safe_height:
+            ratio = safe_height / base_h
+            final_h = int(safe_height)
+            final_w = int(base_w * ratio)
+        else:
+            final_h = base_h
+            final_w = base_w
+    elif screen_height > 1200:
+        scale_factor = 1.3
+        final_w = int(base_w * scale_factor)
+        final_h = int(base_h * scale_factor)
     else:
-        final_h = base_h
         final_w = base_w
-elif screen_height > 1200:
-    scale_factor = 1.3
-    final_w = int(base_w * scale_factor)
-    final_h = int(base_h * scale_factor)
-else:
-    final_w = base_w
-    final_h = base_h
-
-if final_w > screen_width:
-    ratio = (screen_width - 50) / final_w
-    final_w = int(screen_width - 50)
-    final_h = int(final_h * ratio)
-
-x_pos = int((screen_width - final_w) / 2)
-y_pos = int((screen_height - final_h) / 2)
-
-# Load settings and generate theme preload script on startup
-initial_settings = initialize_settings()
-generate_theme_preload(initial_settings)
-
-api = Api()
-window = webview.create_window(
-    title=f"PhotoSlicer v{VERSION}",
-    url="assets/index.html",
-    width=final_w,
-    height=final_h,
-    x=x_pos,
-    y=y_pos,
-    resizable=True,
-    js_api=api,
-    shadow=True,
-)
+        final_h = base_h
 
-window.events.closed += on_close
-window.events.before_show += on_before_show
-window.events.shown += on_shown
-# Register drag-and-drop once the DOM is ready (needs the Python DOM API so the
-# native backend resolves real dropped-folder paths).
-window.events.loaded += register_drop_handler
-# Settings will be loaded asynchronously in app_ready()
-if __name__ == '__main__':
+    if final_w > screen_width:
+        ratio = (screen_width - 50) / final_w
+        final_w = int(screen_width - 50)
+        final_h = int(final_h * ratio)
+
+    x_pos = int((screen_width - final_w) / 2)
+    y_pos = int((screen_height - final_h) / 2)
+
+    # Load settings and generate theme preload script on startup
+    initial_settings = initialize_settings()
+    generate_theme_preload(initial_settings)
+
+    api = Api()
+    window = webview.create_window(
+        title=f"PhotoSlicer v{VERSION}",
+        url="assets/index.html",
+        width=final_w,
+        height=final_h,
+        x=x_pos,
+        y=y_pos,
+        resizable=True,
+        js_api=api,
+        shadow=True,
+    )
+
+    window.events.closed += on_close
+    window.events.before_show += on_before_show
+    window.events.shown += on_shown
+    # Register drag-and-drop once the DOM is ready (needs the Python DOM API so the
+    # native backend resolves real dropped-folder paths).
+    window.events.loaded += register_drop_handler
+    # Settings will be loaded asynchronously in app_ready()
     webview.start()
+
+if __name__ == '__main__':
+    # Lets the frozen (PyInstaller) build run spawned export workers instead of the GUI
+    multiprocessing.freeze_support()
+    main()